@@ -0,0 +1,166 @@
+import re
+import statistics
+import time
+from collections import Counter
+from typing import Any, Callable
+
+from pathier import Pathier
+from pymongo.database import Database
+
+import csv_to_mongo
+import mongo_export
+from chibased import ChiBased
+from dataloader import load_to_sqlite
+
+root = Pathier(__file__).parent
+""" Latency benchmarks for `chi.db` access paths. """
+
+
+def measure(func: Callable[[], Any], runs: int = 20) -> dict[str, float]:
+    """Call `func` `runs` times and return the mean and median latency in milliseconds."""
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "median_ms": statistics.median(latencies),
+    }
+
+
+def like_search(
+    db: ChiBased, term: str, page: int = 1, page_size: int = 25
+) -> list[dict[str, Any]]:
+    """`LIKE` equivalent of `ChiBased.search_violations()`: the same columns, joins, and paging, but unranked."""
+    return db.query(
+        """
+        WITH matches AS (
+            SELECT id FROM violation_details
+            WHERE comment LIKE ?
+            ORDER BY id
+            LIMIT ? OFFSET ?
+        )
+        SELECT
+            violation_details.id AS violation_id,
+            inspections.id AS inspection_id,
+            inspections.date,
+            inspected_businesses.dba,
+            facility_addresses.street,
+            facility_types.name AS facility_type,
+            business_addresses.ward,
+            violation_types.name AS violation,
+            violation_details.comment
+        FROM
+            matches
+            INNER JOIN violation_details ON matches.id = violation_details.id
+            INNER JOIN violation_types ON violation_details.violation_type_id = violation_types.id
+            INNER JOIN inspections ON violation_details.inspection_id = inspections.id
+            LEFT JOIN inspected_businesses ON inspections.inspected_business_id = inspected_businesses.id
+            LEFT JOIN facility_addresses ON inspections.facility_address_id = facility_addresses.id
+            LEFT JOIN facility_types ON facility_addresses.facility_type_id = facility_types.id
+            LEFT JOIN licenses ON inspections.license_number = licenses.license_number
+            LEFT JOIN businesses ON licenses.account_number = businesses.account_number
+            LEFT JOIN business_addresses ON businesses.address_id = business_addresses.id
+        ORDER BY
+            matches.id;""",
+        (f"%{term}%", page_size, (page - 1) * page_size),
+    )
+
+
+def benchmark_violation_search(
+    terms: list[str] = ["rodent", "hot water", "thermometer"],
+    runs: int = 20,
+    page: int = 1,
+):
+    """Compare `ChiBased.search_violations()` against `like_search()` for the same page of results."""
+    with ChiBased() as db:
+        print(f"{'terms':<15} {'fts5 ms':>10} {'like ms':>10} {'speedup':>8}")
+        for term in terms:
+            fts = measure(lambda: db.search_violations(term, page), runs)
+            like = measure(lambda: like_search(db, term, page), runs)
+            print(
+                f"{term:<15} {fts['median_ms']:>10.2f} {like['median_ms']:>10.2f} {like['median_ms'] / fts['median_ms']:>7.1f}x"
+            )
+
+
+def benchmark_comment_storage(runs: int = 5):
+    """Rebuild `chi.db` with each comment storage mode and report size, load time, and query time.
+
+    #### NOTE: This overwrites `chi.db`, the last mode benchmarked is the default inline storage."""
+    modes = {
+        "compressed": (True, True),
+        "interned": (True, False),
+        "inline": (False, False),
+    }
+    print(
+        f"{'mode':<12} {'db MB':>8} {'comment MB':>11} {'stored':>9} {'load s':>8} {'scan ms':>9} {'search ms':>10}"
+    )
+    for mode, (intern_comments, compress_comments) in modes.items():
+        start = time.perf_counter()
+        load_to_sqlite(intern_comments, compress_comments)
+        load_time = time.perf_counter() - start
+        with ChiBased() as db:
+            stats = db.comment_storage_stats
+            scan = measure(
+                lambda: db.query("SELECT id, comment FROM violation_details;"), runs
+            )
+            search = measure(lambda: db.search_violations("rodent"), runs)
+        size = (root / "chi.db").size / 1e6
+        print(
+            f"{mode:<12} {size:>8.2f} {stats['comment_bytes'] / 1e6:>11.2f} {stats['interned_comments'] or stats['violations']:>9} {load_time:>8.2f} {scan['median_ms']:>9.2f} {search['median_ms']:>10.2f}"
+        )
+
+
+def flat_inspections_by_ward(mongo: Database) -> dict[int, int]:
+    """Inspections per ward from the flat csv collections, joining licenses to wards client side."""
+    wards = {
+        row["LICENSE NUMBER"]: row["WARD"]
+        for row in mongo.business_licenses.find({}, {"LICENSE NUMBER": 1, "WARD": 1})
+        # Missing wards are NaN
+        if row["WARD"] == row["WARD"]
+    }
+    return Counter(
+        wards[row["License #"]]
+        for row in mongo.food_inspections.find({}, {"License #": 1})
+        if row.get("License #") in wards
+    )
+
+
+def flat_violation_type_occurrences(mongo: Database) -> dict[int, int]:
+    """Violation type counts from the flat csv collection, parsing the `Violations` strings client side."""
+    occurrences: Counter[int] = Counter()
+    for row in mongo.food_inspections.find({}, {"Violations": 1}):
+        if isinstance(row.get("Violations"), str):
+            occurrences.update(
+                int(type_id)
+                for type_id in re.findall(r"(?:^| \| )([0-9]{1,2})\. ", row["Violations"])
+            )
+    return occurrences
+
+
+def benchmark_mongo(mock: bool = False, runs: int = 5):
+    """Compare the denormalized `inspections` collection's aggregation pipelines against the flat csv collections.
+
+    If `mock` is `True`, `mongomock` is used instead of a local mongod."""
+    mongo = mongo_export.get_database(mock)
+    for file in [root / "business_licenses.csv", root / "food_inspections.csv"]:
+        csv_to_mongo.load_csv(file, mongo)
+    mongo_export.export(mongo)
+    queries = {
+        "inspections_by_ward": lambda: flat_inspections_by_ward(mongo),
+        "violation_type_occurrences": lambda: flat_violation_type_occurrences(mongo),
+    }
+    print(f"{'view':<28} {'embedded ms':>12} {'flat ms':>10} {'speedup':>8}")
+    for view, flat_query in queries.items():
+        embedded = measure(lambda: mongo_export.aggregate(mongo, view), runs)
+        flat = measure(flat_query, runs)
+        print(
+            f"{view:<28} {embedded['median_ms']:>12.2f} {flat['median_ms']:>10.2f} {flat['median_ms'] / embedded['median_ms']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_violation_search()
+    benchmark_comment_storage()
+    benchmark_mongo()
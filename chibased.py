@@ -1,16 +1,206 @@
+import os
+import re
 import sqlite3
 from typing import Any
 
 from databased import Databased
+from databased.databased import dict_factory
 from noiftimer import time_it
 from pathier import Pathier
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 root = Pathier(__file__).parent
+# Both relative to the working directory, like the `chi.db` path `ChiBased` opens
+db_path = Pathier("chi.db")
+generation_path = db_path.parent / "load_generation.txt"
+
+
+def get_load_generation(path: Pathier = generation_path) -> int:
+    """Counter bumped each time `load_to_sqlite()` finishes, used to invalidate cached query results.
+
+    Reads `path` directly, since constructing a `ChiBased` creates an empty `chi.db` if it's missing."""
+    if not path.exists():
+        return 0
+    return int(path.read_text())
 
 
 class ChiBased(Databased):
-    def __init__(self):
-        super().__init__("chi.db", detect_types=False)
+    # Tables that only exist to support the SQLite storage layout
+    sqlite_only_tables = ["violation_comments", "comment_dictionaries", "partitions"]
+    # Tables that are moved into partition files by `partitions.write_partitions()`
+    partitioned_tables = ["inspections", "violations"]
+    # Tables whose MySQL dump should be generated from a view
+    dump_sources = {"violations": "violation_details"}
+
+    def __init__(self, read_only: bool = False):
+        """If `read_only` is `True`, the database is opened in read-only mode and the connection can be shared across threads."""
+        super().__init__(db_path, detect_types=False)
+        self.read_only = read_only
+        self._decompressor = None
+        # Partition names mapped to the first and last inspection year they hold
+        self.partitions: dict[str, tuple[int, int]] = {}
+
+    @property
+    def generation_path(self) -> Pathier:
+        return self.path.parent / "load_generation.txt"
+
+    @property
+    def load_generation(self) -> int:
+        """See `get_load_generation()`."""
+        return get_load_generation(self.generation_path)
+
+    def bump_load_generation(self):
+        """Increment the load generation counter.
+
+        The new value is written to a temporary file and swapped in so concurrent readers never see a partial file."""
+        temp_path = self.generation_path.with_suffix(".txt.tmp")
+        temp_path.write_text(str(self.load_generation + 1))
+        os.replace(temp_path, self.generation_path)
+
+    @property
+    def partition_dir(self) -> Pathier:
+        return self.path.parent / "partitions"
+
+    def connect(self):
+        """Connect to the database, register the `decompress_comment` sql function, and attach any partitions."""
+        if self.read_only:
+            self.connection = sqlite3.connect(
+                f"{self.path.absolute().as_uri()}?mode=ro",
+                uri=True,
+                timeout=self.connection_timeout,
+                check_same_thread=False,
+            )
+            self.connection.row_factory = dict_factory
+        else:
+            super().connect()
+        assert self.connection
+        self.connection.create_function(
+            "decompress_comment", 1, self.decompress_comment, deterministic=True
+        )
+        self.attach_partitions()
+
+    def attach_partitions(self):
+        """If `inspections` and `violations` are partitioned, attach each partition as `chi_{name}`.
+
+        Temporary union views named after the partitioned tables (and `violation_details`) are then created.
+        Since unqualified names resolve to temporary objects first,
+        these shadow the empty main tables and existing queries keep working."""
+        assert self.connection
+        if not self.connection.execute(
+            "SELECT name FROM sqlite_schema WHERE type = 'table' AND name = 'partitions';"
+        ).fetchall():
+            return
+        self.partitions = {
+            row["name"]: (row["first_year"], row["last_year"])
+            for row in self.connection.execute(
+                "SELECT name, first_year, last_year FROM partitions ORDER BY first_year;"
+            ).fetchall()
+        }
+        if not self.partitions:
+            return
+        for name in self.partitions:
+            path = self.partition_dir / f"chi_{name}.db"
+            self.connection.execute(
+                f"ATTACH DATABASE ? AS chi_{name};",
+                (f"{path.absolute().as_uri()}?mode=ro" if self.read_only else str(path),),
+            )
+        for table in self.partitioned_tables:
+            self.connection.execute(
+                f"CREATE TEMP VIEW {table} AS {self.get_partition_union(table, list(self.partitions))};"
+            )
+        view = self.connection.execute(
+            "SELECT sql FROM sqlite_schema WHERE type = 'view' AND name = 'violation_details';"
+        ).fetchall()
+        if view:
+            self.connection.execute(
+                re.sub(r"^CREATE VIEW", "CREATE TEMP VIEW", view[0]["sql"])
+            )
+
+    def get_partition_union(self, table: str, names: list[str]) -> str:
+        return " UNION ALL ".join(f"SELECT * FROM chi_{name}.{table}" for name in names)
+
+    def partition_source(
+        self, table: str, start_date: str | None = None, end_date: str | None = None
+    ) -> str:
+        """Return a table expression for `table` (`inspections` or `violations`)
+        that only reads the partitions overlapping `start_date` through `end_date` (`%Y-%m-%d` strings, inclusive).
+
+        If the database isn't partitioned or neither date is given, `table` is returned.
+
+        The caller is still responsible for filtering rows within the returned partitions:
+        >>> with ChiBased() as db:
+        >>>     source = db.partition_source("inspections", "2023-01-01")
+        >>>     rows = db.query(f"SELECT * FROM {source} AS inspections WHERE date >= '2023-01-01';")
+        """
+        if not self.connected:
+            self.connect()
+        if not self.partitions or not (start_date or end_date):
+            return table
+        first = int(start_date[:4]) if start_date else 0
+        last = int(end_date[:4]) if end_date else 9999
+        names = [
+            name
+            for name, (first_year, last_year) in self.partitions.items()
+            if first_year <= last and first <= last_year
+        ]
+        if not names:
+            return f"(SELECT * FROM main.{table})"
+        return f"({self.get_partition_union(table, names)})"
+
+    def decompress_comment(self, comment: bytes) -> str:
+        """Decompress a `violation_comments.comment` value that was stored with `compressed = 1`."""
+        if not self._decompressor:
+            if not zstandard:
+                raise ImportError(
+                    "The `zstandard` package is required to read compressed comments."
+                )
+            rows = self.connection.execute(  # type: ignore
+                "SELECT dictionary FROM comment_dictionaries ORDER BY id DESC LIMIT 1;"
+            ).fetchall()
+            dictionary = (
+                zstandard.ZstdCompressionDict(rows[0]["dictionary"]) if rows else None
+            )
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return self._decompressor.decompress(comment).decode("utf-8")
+
+    def create_compressed_comments_view(self):
+        """Replace the `violation_details` view with one that decompresses `violation_comments` stored with `compressed = 1`.
+
+        The view, and the `violations_fts` triggers that read from it, then need the `decompress_comment` function,
+        so a database loaded with `compress_comments=True` can only be read or modified through `ChiBased`."""
+        self.query("DROP VIEW IF EXISTS violation_details;")
+        self.query(
+            """
+            CREATE VIEW
+                violation_details AS
+            SELECT
+                violations.id,
+                violations.inspection_id,
+                violations.violation_type_id,
+                COALESCE(
+                    violations.comment,
+                    CASE
+                        WHEN violation_comments.compressed THEN decompress_comment (violation_comments.comment)
+                        ELSE violation_comments.comment
+                    END
+                ) AS comment
+            FROM
+                violations
+                LEFT JOIN violation_comments ON violations.comment_id = violation_comments.id;"""
+        )
+
+    def create_views_script(self):
+        """Create the temporary views from `sqlite_views.sql` (SQLite equivalents of `mysql_views.sql`) on this connection."""
+        if not self.connected:
+            self.connect()
+        assert self.connection
+        self.connection.executescript(
+            (root / "sqlite_views.sql").read_text(encoding="utf-8")
+        )
 
     def create_tables_script(self):
         """Create tables from `chi_tables.sql` script.
@@ -19,19 +209,144 @@ class ChiBased(Databased):
         self.execute_script((root / "chidata_ddl_sqlite.sql"))
         self.vacuum()
 
+    @property
+    def mysql_tables(self) -> list[str]:
+        """Tables that have a MySQL counterpart.
+
+        Excludes `self.sqlite_only_tables` as well as SQLite virtual tables, like `violations_fts`, and their shadow tables."""
+        virtual_tables = [
+            row["name"]
+            for row in self.query(
+                "SELECT name FROM sqlite_schema WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL TABLE%';"
+            )
+        ]
+        return [
+            table
+            for table in self.tables
+            if table not in self.sqlite_only_tables
+            and not any(
+                table == virtual_table or table.startswith(f"{virtual_table}_")
+                for virtual_table in virtual_tables
+            )
+        ]
+
+    def search_violations(
+        self,
+        terms: str,
+        page: int = 1,
+        page_size: int = 25,
+        raw: bool = False,
+        start_date: str | None = None,
+        end_date: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Full-text search of violation comments ranked by BM25 (best match first).
+
+        Each returned row is a matching violation joined to its inspection, facility, and ward.
+
+        #### :params:
+        * `terms`: Words that must all appear in a comment.
+        Raises a `ValueError` if there are none, unless `raw` is `True`.
+        * `page`: 1-based page number.
+        * `page_size`: Number of rows per page.
+        * `raw`: Pass `terms` to FTS5 as is instead of quoting each word,
+        allowing FTS5 query syntax like `'"no hot water" OR rodent*'`.
+        * `start_date`, `end_date`: Only return violations from inspections in this range (`%Y-%m-%d`, inclusive).
+        If `chi.db` is partitioned, only the partitions overlapping the range are read.
+
+        >>> with ChiBased() as db:
+        >>>     rows = db.search_violations("rodent droppings", page=2, start_date="2023-01-01")"""
+        if not raw:
+            if not terms.split():
+                raise ValueError(
+                    "`terms` must contain at least one word to search for."
+                )
+            terms = " ".join(
+                '"' + term.replace('"', '""') + '"' for term in terms.split()
+            )
+        inspections = self.partition_source("inspections", start_date, end_date)
+        violations = self.partition_source("violations", start_date, end_date)
+        conditions = ["violations_fts MATCH ?"]
+        parameters: list[Any] = [terms]
+        if start_date:
+            conditions.append("inspections.date >= ?")
+            parameters.append(start_date)
+        if end_date:
+            conditions.append("inspections.date <= ?")
+            parameters.append(end_date)
+        # Date filters have to be applied before paging
+        date_joins = (
+            f"""
+                INNER JOIN {violations} AS violations ON violations_fts.rowid = violations.id
+                INNER JOIN {inspections} AS inspections ON violations.inspection_id = inspections.id"""
+            if start_date or end_date
+            else ""
+        )
+        return self.query(
+            f"""
+            WITH matches AS (
+                SELECT violations_fts.rowid, violations_fts.rank FROM violations_fts{date_joins}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY violations_fts.rank
+                LIMIT ? OFFSET ?
+            )
+            SELECT
+                violation_details.id AS violation_id,
+                inspections.id AS inspection_id,
+                inspections.date,
+                inspected_businesses.dba,
+                facility_addresses.street,
+                facility_types.name AS facility_type,
+                business_addresses.ward,
+                violation_types.name AS violation,
+                violation_details.comment,
+                matches.rank
+            FROM
+                matches
+                INNER JOIN violation_details ON matches.rowid = violation_details.id
+                INNER JOIN violation_types ON violation_details.violation_type_id = violation_types.id
+                INNER JOIN {inspections} AS inspections ON violation_details.inspection_id = inspections.id
+                LEFT JOIN inspected_businesses ON inspections.inspected_business_id = inspected_businesses.id
+                LEFT JOIN facility_addresses ON inspections.facility_address_id = facility_addresses.id
+                LEFT JOIN facility_types ON facility_addresses.facility_type_id = facility_types.id
+                LEFT JOIN licenses ON inspections.license_number = licenses.license_number
+                LEFT JOIN businesses ON licenses.account_number = businesses.account_number
+                LEFT JOIN business_addresses ON businesses.address_id = business_addresses.id
+            ORDER BY
+                matches.rank;""",
+            parameters + [page_size, (page - 1) * page_size],
+        )
+
+    @property
+    def comment_storage_stats(self) -> dict[str, int]:
+        """Number of violations, distinct stored comments, compressed comments, and stored comment bytes."""
+        return self.query(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM violations) AS violations,
+                (SELECT COUNT(*) FROM violation_comments) AS interned_comments,
+                (SELECT COUNT(*) FROM violation_comments WHERE compressed) AS compressed_comments,
+                (SELECT COALESCE(SUM(LENGTH(CAST(comment AS BLOB))), 0) FROM violations)
+                + (SELECT COALESCE(SUM(LENGTH(comment)), 0) FROM violation_comments) AS comment_bytes;"""
+        )[0]
+
+    def optimize_search_index(self):
+        """Merge the `violations_fts` index b-trees after a bulk load."""
+        self.query("INSERT INTO violations_fts (violations_fts) VALUES ('optimize');")
+
     @time_it()
     def generate_mysql_dump(self):
         """Generate a file called `chidata_dml_mysql.sql` that contains insert statements for all of the data."""
         output = "USE chidata;\n"
         output += "SET foreign_key_checks = 0;\n"
         indent = "    "
-        for table in self.tables:
+        for table in self.mysql_tables:
+            source = self.dump_sources.get(table, table)
             output += f"TRUNCATE TABLE {table};\n"
-            columns = ", ".join(self.get_columns(table))
+            columns = ", ".join(self.get_columns(source))
             output += "INSERT INTO\n"
             output += f"{indent}{table} ({columns})\n"
             output += "VALUES\n"
-            rows = [list(row.values()) for row in self.select(table)]
+            rows = [list(row.values()) for row in self.select(source)]
             rows = [tuple([value or "NULL" for value in row]) for row in rows]
             output += ",\n".join(f"{indent}{row}" for row in rows)
             output += ";\n"
@@ -148,6 +148,7 @@ CREATE TABLE IF NOT EXISTS `chidata`.`facility_addresses` (
   `longitude` FLOAT NULL,
   `facility_type_id` INT NULL,
   `risk_id` INT NULL,
+  `ward` TINYINT(2) NULL,
   PRIMARY KEY (`id`),
   INDEX `facility_type_id_idx` (`facility_type_id` ASC) VISIBLE,
   INDEX `risk_id_idx` (`risk_id` ASC) VISIBLE,
@@ -184,6 +185,31 @@ CREATE TABLE IF NOT EXISTS `chidata`.`inspected_businesses` (
 ENGINE = InnoDB;
 
 
+-- -----------------------------------------------------
+-- Table `chidata`.`business_links`
+-- -----------------------------------------------------
+DROP TABLE IF EXISTS `chidata`.`business_links` ;
+
+CREATE TABLE IF NOT EXISTS `chidata`.`business_links` (
+  `inspected_business_id` INT NOT NULL,
+  `license_number` INT NULL,
+  `account_number` INT NULL,
+  `confidence` FLOAT NULL,
+  PRIMARY KEY (`inspected_business_id`),
+  INDEX `account_number_idx` (`account_number` ASC) VISIBLE,
+  CONSTRAINT `business_links_inspected_business_id`
+    FOREIGN KEY (`inspected_business_id`)
+    REFERENCES `chidata`.`inspected_businesses` (`id`)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION,
+  CONSTRAINT `business_links_account_number`
+    FOREIGN KEY (`account_number`)
+    REFERENCES `chidata`.`businesses` (`account_number`)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION)
+ENGINE = InnoDB;
+
+
 -- -----------------------------------------------------
 -- Table `chidata`.`inspection_types`
 -- -----------------------------------------------------
@@ -216,12 +242,14 @@ DROP TABLE IF EXISTS `chidata`.`inspections` ;
 CREATE TABLE IF NOT EXISTS `chidata`.`inspections` (
   `id` INT NOT NULL,
   `license_number` INT NULL,
+  `inspected_business_id` INT NULL,
   `facility_address_id` INT NULL,
   `inspection_type_id` INT NULL,
   `result_type_id` INT NULL,
   `date` DATE NULL,
   PRIMARY KEY (`id`),
   INDEX `license_number_idx` (`license_number` ASC) VISIBLE,
+  INDEX `inspected_business_id_idx` (`inspected_business_id` ASC) VISIBLE,
   INDEX `facility_address_id_idx` (`facility_address_id` ASC) VISIBLE,
   INDEX `inspection_type_id_idx` (`inspection_type_id` ASC) VISIBLE,
   INDEX `result_type_id_idx` (`result_type_id` ASC) VISIBLE,
@@ -230,6 +258,11 @@ CREATE TABLE IF NOT EXISTS `chidata`.`inspections` (
     REFERENCES `chidata`.`licenses` (`license_number`)
     ON DELETE NO ACTION
     ON UPDATE NO ACTION,
+  CONSTRAINT `inspections_inspected_business_id`
+    FOREIGN KEY (`inspected_business_id`)
+    REFERENCES `chidata`.`inspected_businesses` (`id`)
+    ON DELETE NO ACTION
+    ON UPDATE NO ACTION,
   CONSTRAINT `inspections_facility_address_id`
     FOREIGN KEY (`facility_address_id`)
     REFERENCES `chidata`.`facility_addresses` (`id`)
@@ -273,6 +306,7 @@ CREATE TABLE IF NOT EXISTS `chidata`.`violations` (
   PRIMARY KEY (`id`),
   INDEX `inspection_id_idx` (`inspection_id` ASC) VISIBLE,
   INDEX `violation_type_id_idx` (`violation_type_id` ASC) VISIBLE,
+  FULLTEXT INDEX `comment_fulltext_idx` (`comment`) VISIBLE,
   CONSTRAINT `violations_inspection_id`
     FOREIGN KEY (`inspection_id`)
     REFERENCES `chidata`.`inspections` (`id`)
@@ -13,6 +13,20 @@ CREATE TABLE
         longitude REAL
     );
 
+------------------------------------------------|
+-- Spatial index over `business_addresses` coordinates,
+-- populated by `spatial.build_spatial_index()`
+DROP TABLE IF EXISTS business_addresses_rtree;
+
+CREATE VIRTUAL TABLE
+    business_addresses_rtree USING rtree (
+        id,
+        min_latitude,
+        max_latitude,
+        min_longitude,
+        max_longitude
+    );
+
 ------------------------------------------------|
 DROP TABLE IF EXISTS businesses;
 
@@ -107,12 +121,29 @@ CREATE TABLE
         latitude REAL,
         longitude REAL,
         facility_type_id INTEGER,
-        risk_id INTEGER
+        risk_id INTEGER,
+        ward INTEGER
+    );
+
+------------------------------------------------|
+-- Spatial index over `facility_addresses` coordinates,
+-- populated by `spatial.build_spatial_index()`
+DROP TABLE IF EXISTS facility_addresses_rtree;
+
+CREATE VIRTUAL TABLE
+    facility_addresses_rtree USING rtree (
+        id,
+        min_latitude,
+        max_latitude,
+        min_longitude,
+        max_longitude
     );
 
 ------------------------------------------------|
 DROP TABLE IF EXISTS inspected_businesses;
 
+-- Inspections without a license number get a row with a NULL `license_number`,
+-- referenced by `inspections.inspected_business_id`
 CREATE TABLE
     inspected_businesses (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -121,6 +152,19 @@ CREATE TABLE
         aka TEXT
     );
 
+------------------------------------------------|
+-- Record linkage from inspected businesses with unmatched license numbers to `businesses`,
+-- populated by `linkage.link_businesses()`
+DROP TABLE IF EXISTS business_links;
+
+CREATE TABLE
+    business_links (
+        inspected_business_id INTEGER PRIMARY KEY,
+        license_number INTEGER,
+        account_number INTEGER,
+        confidence REAL
+    );
+
 ------------------------------------------------|
 DROP TABLE IF EXISTS inspection_types;
 
@@ -143,12 +187,25 @@ CREATE TABLE
     inspections (
         id INTEGER PRIMARY KEY,
         license_number INTEGER,
+        inspected_business_id INTEGER,
         facility_address_id INTEGER,
         inspection_type_id INTEGER,
         result_type_id INTEGER,
         date DATE
     );
 
+------------------------------------------------|
+-- Files that `inspections` and `violations` are partitioned into when loading with `partitioned=True`,
+-- each holding inspections dated `first_year` through `last_year`
+DROP TABLE IF EXISTS partitions;
+
+CREATE TABLE
+    partitions (
+        name TEXT PRIMARY KEY,
+        first_year INTEGER,
+        last_year INTEGER
+    );
+
 ------------------------------------------------|
 DROP TABLE IF EXISTS violation_types;
 
@@ -163,5 +220,118 @@ CREATE TABLE
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         inspection_id INTEGER,
         violation_type_id INTEGER,
-        comment TEXT
-    );
\ No newline at end of file
+        comment TEXT,
+        comment_id INTEGER
+    );
+
+------------------------------------------------|
+-- Deduplicated comment storage,
+-- used in place of `violations.comment` when loading with `intern_comments=True` or `compress_comments=True`
+DROP TABLE IF EXISTS violation_comments;
+
+CREATE TABLE
+    violation_comments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        comment BLOB,
+        compressed INTEGER
+    );
+
+------------------------------------------------|
+-- zstd dictionary for compressed `violation_comments`
+DROP TABLE IF EXISTS comment_dictionaries;
+
+CREATE TABLE
+    comment_dictionaries (id INTEGER PRIMARY KEY, dictionary BLOB);
+
+------------------------------------------------|
+-- `violations` with comment text resolved for inline and interned storage.
+-- Loading with `compress_comments=True` replaces this with a view that also decompresses
+-- (see `ChiBased.create_compressed_comments_view()`)
+DROP VIEW IF EXISTS violation_details;
+
+CREATE VIEW
+    violation_details AS
+SELECT
+    violations.id,
+    violations.inspection_id,
+    violations.violation_type_id,
+    COALESCE(violations.comment, violation_comments.comment) AS comment
+FROM
+    violations
+    LEFT JOIN violation_comments ON violations.comment_id = violation_comments.id;
+
+------------------------------------------------|
+-- Full-text index over violation comments,
+-- kept in sync with `violations` by the triggers below.
+-- Loading with `partitioned=True` replaces this with an index that stores its own comment text
+-- (see `partitions.store_search_index()`)
+DROP TABLE IF EXISTS violations_fts;
+
+CREATE VIRTUAL TABLE
+    violations_fts USING fts5 (
+        comment,
+        content = 'violation_details',
+        content_rowid = 'id',
+        tokenize = 'porter unicode61'
+    );
+
+CREATE TRIGGER
+    violations_fts_insert AFTER INSERT ON violations BEGIN
+INSERT INTO
+    violations_fts (rowid, comment)
+SELECT
+    id,
+    comment
+FROM
+    violation_details
+WHERE
+    id = new.id;
+
+END;
+
+CREATE TRIGGER
+    violations_fts_delete BEFORE DELETE ON violations BEGIN
+INSERT INTO
+    violations_fts (violations_fts, rowid, comment)
+SELECT
+    'delete',
+    id,
+    comment
+FROM
+    violation_details
+WHERE
+    id = old.id;
+
+END;
+
+CREATE TRIGGER
+    violations_fts_update_delete BEFORE
+UPDATE ON violations BEGIN
+INSERT INTO
+    violations_fts (violations_fts, rowid, comment)
+SELECT
+    'delete',
+    id,
+    comment
+FROM
+    violation_details
+WHERE
+    id = old.id;
+
+END;
+
+CREATE TRIGGER
+    violations_fts_update_insert AFTER
+UPDATE ON violations BEGIN
+INSERT INTO
+    violations_fts (rowid, comment)
+SELECT
+    id,
+    comment
+FROM
+    violation_details
+WHERE
+    id = new.id;
+
+END;
+
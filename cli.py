@@ -0,0 +1,200 @@
+import time
+
+start = time.perf_counter()
+
+import argparse
+import functools
+import json
+import statistics
+from typing import Any, Callable
+
+from pathier import Pathier
+
+root = Pathier(__file__).parent
+startup_log = root / "startup_times.json"
+max_samples = 100
+""" Single entry point for the pipeline.
+
+Subcommands import their dependencies when they run,
+so e.g. `cli.py dump` never imports pandas, numpy, pymongo, or requests.
+
+>>> python cli.py load --partitioned
+>>> python cli.py stage dump --force
+>>> python cli.py startup"""
+
+Command = Callable[[], Any]
+
+
+def get_pull(args: argparse.Namespace, extra: list[str]) -> Command:
+    from pull_data import pull
+
+    return pull
+
+
+def get_load(args: argparse.Namespace, extra: list[str]) -> Command:
+    import dataloader
+
+    # Options are parsed by `dataloader.get_args()` so the two stay in sync
+    options = dataloader.get_args(extra)
+    return functools.partial(
+        dataloader.load_to_sqlite,
+        options.intern_comments or options.compress_comments,
+        options.compress_comments,
+        options.partitioned,
+        options.profile,
+        not options.no_profile_memory,
+    )
+
+
+def get_dump(args: argparse.Namespace, extra: list[str]) -> Command:
+    from pipeline import generate_mysql_dump
+
+    return generate_mysql_dump
+
+
+def get_mysql(args: argparse.Namespace, extra: list[str]) -> Command:
+    import mysql_executor
+
+    return mysql_executor.main
+
+
+def get_mongo(args: argparse.Namespace, extra: list[str]) -> Command:
+    if args.raw:
+        import csv_to_mongo
+
+        def load_csvs():
+            mongo = csv_to_mongo.MongoClient().chicago
+            for file in root.glob("*.csv"):
+                print(f"Loading data from {file.name}...")
+                print(f"{csv_to_mongo.load_csv(file, mongo)} records inserted.")
+
+        return load_csvs
+    import mongo_export
+
+    return lambda: print(
+        f"{mongo_export.export(mongo_export.get_database(args.mock))} inspection documents exported."
+    )
+
+
+def get_stage(args: argparse.Namespace, extra: list[str]) -> Command:
+    import pipeline
+
+    return functools.partial(pipeline.run_stage, args.name, args.force)
+
+
+def get_run(args: argparse.Namespace, extra: list[str]) -> Command:
+    import pipeline
+
+    options = pipeline.get_args(extra)
+    return functools.partial(
+        pipeline.main, options.force, options.profile, not options.no_profile_memory
+    )
+
+
+def get_startup(args: argparse.Namespace, extra: list[str]) -> Command:
+    return print_startup_report
+
+
+def load_startup_times() -> dict[str, list[float]]:
+    if not startup_log.exists():
+        return {}
+    return json.loads(startup_log.read_text())
+
+
+def record_startup(command: str, seconds: float):
+    """Append `seconds` to the startup times logged for `command`, keeping the most recent `max_samples`."""
+    times = load_startup_times()
+    times[command] = (times.get(command, []) + [seconds])[-max_samples:]
+    startup_log.write_text(json.dumps(times, indent=2))
+
+
+def print_startup_report():
+    """Print the last, median, and max logged startup time of each subcommand."""
+    times = load_startup_times()
+    if not times:
+        print("No startup times recorded yet.")
+        return
+    print(f"  {'command':<8} {'runs':>5} {'last':>8} {'median':>8} {'max':>8}")
+    for command, samples in sorted(times.items()):
+        print(
+            f"  {command:<8} {len(samples):>5} {samples[-1] * 1000:>6.0f}ms {statistics.median(samples) * 1000:>6.0f}ms {max(samples) * 1000:>6.0f}ms"
+        )
+
+
+def get_args(args: list[str] | None = None) -> tuple[argparse.Namespace, list[str]]:
+    """Returns the parsed arguments and any that are passed through to the subcommand's module."""
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparser = subparsers.add_parser("pull", help="Download the datasets.")
+    subparser.set_defaults(get_command=get_pull)
+
+    # `add_help=False` passes `-h` through to `dataloader.get_args()`
+    subparser = subparsers.add_parser(
+        "load",
+        add_help=False,
+        help="Create and populate `chi.db`. Accepts the same options as `dataloader.py`.",
+    )
+    subparser.set_defaults(get_command=get_load)
+
+    subparser = subparsers.add_parser("dump", help="Generate `chidata_dml_mysql.sql`.")
+    subparser.set_defaults(get_command=get_dump)
+
+    subparser = subparsers.add_parser("mysql", help="Create and populate the MySQL database.")
+    subparser.set_defaults(get_command=get_mysql)
+
+    subparser = subparsers.add_parser(
+        "mongo", help="Export `chi.db` to MongoDB as denormalized inspection documents."
+    )
+    subparser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Load the `.csv` files as flat collections instead (`csv_to_mongo.py`).",
+    )
+    subparser.add_argument(
+        "--mock", action="store_true", help="Export to an in-memory `mongomock` database."
+    )
+    subparser.set_defaults(get_command=get_mongo)
+
+    subparser = subparsers.add_parser(
+        "stage", help="Run a single cached stage from `pipeline.py`."
+    )
+    # Kept in sync with `pipeline.stages` without importing it
+    subparser.add_argument("name", choices=["load", "dump", "mysql"])
+    subparser.add_argument(
+        "--force", action="store_true", help="Rerun the stage even if it's fresh."
+    )
+    subparser.set_defaults(get_command=get_stage)
+
+    subparser = subparsers.add_parser(
+        "run",
+        add_help=False,
+        help="Run the whole pipeline. Accepts the same options as `pipeline.py`.",
+    )
+    subparser.set_defaults(get_command=get_run)
+
+    subparser = subparsers.add_parser(
+        "startup", help="Show logged subcommand startup times."
+    )
+    subparser.set_defaults(get_command=get_startup)
+
+    parsed, extra = parser.parse_known_args(args)
+    if extra and parsed.command not in ["load", "run"]:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return parsed, extra
+
+
+def main(args: list[str] | None = None):
+    """Parse `args`, import what the subcommand needs, log the startup time, and run it.
+
+    Startup time is measured from when this module started executing until the subcommand is ready to run,
+    i.e. argument parsing plus the subcommand's imports. Interpreter startup isn't included."""
+    parsed, extra = get_args(args)
+    command = parsed.get_command(parsed, extra)
+    if parsed.command != "startup":
+        record_startup(parsed.command, time.perf_counter() - start)
+    command()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 import pandas
 from pathier import Pathier
 from pymongo import MongoClient
+from pymongo.database import Database
 
 root = Pathier(__file__).parent
 
 
-def load_csv(file: Pathier) -> int:
-    """Returns number of inserted records."""
+def load_csv(file: Pathier, mongo: Database | None = None) -> int:
+    """Returns number of inserted records.
+
+    Records are loaded into the `chicago` database of a local mongod unless `mongo` is given."""
     collection_name = file.stem.lower()
-    db = MongoClient().chicago.get_collection(collection_name)
+    db = (mongo if mongo is not None else MongoClient().chicago).get_collection(
+        collection_name
+    )
     db.delete_many({})
     data = pandas.read_csv(file).to_dict("records")
     return len(db.insert_many(data).inserted_ids)
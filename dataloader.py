@@ -1,3 +1,4 @@
+import argparse
 import re
 from typing import Any
 
@@ -7,11 +8,22 @@ from noiftimer import time_it
 from pathier import Pathier
 from younotyou import younotyou
 
+import linkage
+import partitions
+import spatial
 from chibased import ChiBased
+from profiling import Profiler
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 root = Pathier(__file__).parent
 licenses_path = root / "business_licenses.csv"
 inspections_path = root / "food_inspections.csv"
+# `violations.id` is `inspection_id * max_violations_per_inspection` + the violation's position in the inspection
+max_violations_per_inspection = 100
 pandas.set_option("mode.chained_assignment", None)
 """ Functions for reading, cleaning, and normalizing csv data. """
 
@@ -362,6 +374,17 @@ class BusinessLicenses:
                 licenses.values.tolist(),
             )
 
+    # Methods called by `prepare_data()`, profiled as separate stages by `load_to_sqlite(profile=True)`
+    preparation_steps = [
+        "load",
+        "rename_columns",
+        "remove_non_chicago_entries",
+        "drop_columns",
+        "normalize_strings",
+        "convert_dates",
+        "fill_missing",
+    ]
+
     @time_it()
     def prepare_data(self) -> pandas.DataFrame:
         """Run preparation pipeline and return dataframe."""
@@ -378,20 +401,40 @@ class BusinessLicenses:
     def load_data_to_db(self):
         """Prepare and insert data into sqlite database."""
         data = self.prepare_data()
-        # Get and execute all data insertion functions in this class
+        for func in self.insertion_stages:
+            getattr(self, func)(data)
+
+    @property
+    def insertion_stages(self) -> list[str]:
+        """Names of the data insertion functions in this class, in the order they're defined."""
+        # Get all data insertion functions in this class
         # (I keep forgetting to add each one here after I write it
         # and then wonder why the data didn't show up in the database)
         # (NOTE: This means the order of the functions in the class matters)
         # `self.__class__.__base__().__dir__()` is so child classes don't call parent class data insertion functions
-        for func in younotyou(
+        return younotyou(
             self.__dir__(), ["insert_*_data"], self.__class__.__base__().__dir__()  # type: ignore
-        ):
-            getattr(self, func)(data)
+        )
 
 
 class FoodInspections(BusinessLicenses):
-    def __init__(self):
+    def __init__(self, intern_comments: bool = False, compress_comments: bool = False):
+        """#### :params:
+        * `intern_comments`: Store each distinct violation comment once in the `violation_comments` table
+        and reference it by `violations.comment_id` instead of repeating the text in `violations.comment`.
+        * `compress_comments`: Intern comments and zstd compress those of at least `self.compression_threshold` bytes
+        using a dictionary trained on the comments. Implies `intern_comments`. Requires the `zstandard` package.
+        """
         self.csv_path = inspections_path
+        # Compressed comments are only stored in `violation_comments`
+        self.intern_comments = intern_comments or compress_comments
+        self.compress_comments = compress_comments
+        self.compression_threshold = 64
+        # `inspected_businesses` ids for inspections without a license number,
+        # set by `insert_inspected_business_data()`
+        self.unlicensed_businesses: pandas.DataFrame | None = None
+        if compress_comments and not zstandard:
+            raise ImportError("The `zstandard` package is required to compress comments.")
 
     @time_it()
     def rename_columns(self, data: pandas.DataFrame) -> pandas.DataFrame:
@@ -443,6 +486,16 @@ class FoodInspections(BusinessLicenses):
         """Remove school facilities. (They seem to be operating under a different licensing scheme.)"""
         return data[~data["facility_type"].str.contains("School", na=False)]
 
+    @time_it()
+    def clear_invalid_license_numbers(self, data: pandas.DataFrame) -> pandas.DataFrame:
+        """Treat license numbers that aren't positive as missing.
+
+        The dataset uses `0` when an inspection has no license number.
+        Without this, every such inspection would share one `inspected_businesses` row."""
+        return data.assign(
+            license_number=data["license_number"].where(data["license_number"] > 0)
+        )
+
     @time_it()
     def insert_facility_type_data(self, data: pandas.DataFrame):
         """Populate `facility_types` table."""
@@ -461,9 +514,23 @@ class FoodInspections(BusinessLicenses):
 
     @time_it()
     def insert_facility_address_data(self, data: pandas.DataFrame):
-        """Populate `facility_addresses` table."""
+        """Populate `facility_addresses` table.
+
+        Each address's id is the first inspection id at that street,
+        so ids don't shift when new streets are added (see `partitions.write_partitions()`)."""
         data = (
-            data[["street", "zip", "latitude", "longitude", "facility_type", "risk"]]
+            data[
+                [
+                    "inspection_id",
+                    "street",
+                    "zip",
+                    "latitude",
+                    "longitude",
+                    "facility_type",
+                    "risk",
+                ]
+            ]
+            .sort_values("inspection_id")
             .drop_duplicates(["street"])
             .sort_values("street")
         )
@@ -482,6 +549,7 @@ class FoodInspections(BusinessLicenses):
             db.insert(
                 "facility_addresses",
                 [
+                    "id",
                     "street",
                     "zip",
                     "latitude",
@@ -494,18 +562,36 @@ class FoodInspections(BusinessLicenses):
 
     @time_it()
     def insert_inspected_business_data(self, data: pandas.DataFrame):
-        """Populate `inspected_businesses` table."""
-        data = (
-            data[["license_number", "dba", "aka"]]
-            .drop_duplicates("license_number")
+        """Populate `inspected_businesses` table.
+
+        Businesses with a license number get one row per license number.
+        Inspections without a license number get one row per `dba`, `aka`, and street with a `NULL` license number,
+        so `linkage.link_businesses()` can still match them to a business.
+
+        Each row's id is the business's first inspection id, so ids don't shift when new businesses are added."""
+        data = data.sort_values("inspection_id")
+        licensed = (
+            data[["inspection_id", "license_number", "dba", "aka"]]
             .dropna(subset=["license_number"])
+            .drop_duplicates("license_number")
             .sort_values("license_number")
         )
+        unlicensed = (
+            data[data["license_number"].isna()][["inspection_id", "dba", "aka", "street"]]
+            .drop_duplicates(["dba", "aka", "street"])
+            .sort_values("inspection_id")
+            .rename(columns={"inspection_id": "inspected_business_id"})
+        )
+        self.unlicensed_businesses = unlicensed
         with ChiBased() as db:
             db.insert(
                 "inspected_businesses",
-                ["license_number", "dba", "aka"],
-                data.values.tolist(),
+                ["id", "license_number", "dba", "aka"],
+                licensed.values.tolist()
+                + [
+                    [inspected_business_id, None, dba, aka]
+                    for inspected_business_id, dba, aka, _ in unlicensed.values.tolist()
+                ],
             )
 
     @time_it()
@@ -533,16 +619,46 @@ class FoodInspections(BusinessLicenses):
             [
                 "inspection_id",
                 "license_number",
+                "dba",
+                "aka",
                 "street",
                 "inspection_type",
                 "results",
                 "inspection_date",
             ]
         ].sort_values("inspection_id")
-        data = data.dropna(subset=["license_number"])
+        licensed = data.dropna(subset=["license_number"])
+        inspected_business_ids = self.get_id_lookup_table(
+            "inspected_businesses", "id", "license_number"
+        )
+        licensed = licensed.assign(
+            inspected_business_id=licensed["license_number"].map(
+                inspected_business_ids
+            )
+        )
+        unlicensed = data[data["license_number"].isna()].merge(
+            self.unlicensed_businesses, on=["dba", "aka", "street"], how="left"
+        )
+        data = pandas.concat([licensed, unlicensed]).sort_values("inspection_id")
         data = data.drop_duplicates(
-            subset=["license_number", "inspection_type", "results", "inspection_date"]
+            subset=[
+                "inspected_business_id",
+                "inspection_type",
+                "results",
+                "inspection_date",
+            ]
         )
+        data = data[
+            [
+                "inspection_id",
+                "license_number",
+                "inspected_business_id",
+                "street",
+                "inspection_type",
+                "results",
+                "inspection_date",
+            ]
+        ]
         for args in [
             ["street", "facility_address_id", "facility_addresses", "id", "street"],
             ["inspection_type", "inspection_type_id", "inspection_types", "id", "name"],
@@ -555,6 +671,7 @@ class FoodInspections(BusinessLicenses):
                 [
                     "id",
                     "license_number",
+                    "inspected_business_id",
                     "facility_address_id",
                     "inspection_type_id",
                     "result_type_id",
@@ -591,35 +708,122 @@ class FoodInspections(BusinessLicenses):
 
     @time_it()
     def insert_violations_data(self, data: pandas.DataFrame):
-        """Populate `violations` and `violation_types` tables."""
+        """Populate `violations` and `violation_types` tables.
+
+        Violation ids are derived from the inspection id and the violation's position in the inspection,
+        so they don't depend on the order of rows in the csv."""
         data = data[["violations", "inspection_id"]].dropna(subset=["violations"])
         with ChiBased() as db:
-            inspection_ids = [
+            inspection_ids = {
                 list(row.values())[0] for row in db.select("inspections", ["id"])
-            ]
+            }
 
         unique_violations = {}
         inspection_violations = []
         for item in data.values.tolist():
             violation, inspection_id = item
-            for violation in self.parse_violation(violation):
+            violations = self.parse_violation(violation)
+            if len(violations) > max_violations_per_inspection:
+                raise ValueError(
+                    f"Inspection {inspection_id} has more than {max_violations_per_inspection} violations."
+                )
+            for position, violation in enumerate(violations):
                 violation_id, violation, comment = violation
                 if violation_id not in unique_violations:
                     unique_violations[violation_id] = violation
                 if inspection_id in inspection_ids:
-                    inspection_violations.append((inspection_id, violation_id, comment))
+                    inspection_violations.append(
+                        (
+                            inspection_id * max_violations_per_inspection + position,
+                            inspection_id,
+                            violation_id,
+                            comment,
+                        )
+                    )
         unique_violations = [
             (key, unique_violations[key])
             for key in sorted(list(unique_violations.keys()))
         ]
         with ChiBased() as db:
             db.insert("violation_types", ["id", "name"], unique_violations)
+            if not self.intern_comments:
+                db.insert(
+                    "violations",
+                    ["id", "inspection_id", "violation_type_id", "comment"],
+                    inspection_violations,
+                )
+                return
+            comments, comment_ids = self.get_interned_comments(
+                db, [(violation[0], violation[3]) for violation in inspection_violations]
+            )
+            db.insert(
+                "violation_comments", ["id", "comment", "compressed"], comments
+            )
             db.insert(
                 "violations",
-                ["inspection_id", "violation_type_id", "comment"],
-                inspection_violations,
+                ["id", "inspection_id", "violation_type_id", "comment_id"],
+                [
+                    (id_, inspection_id, violation_id, comment_ids[comment])
+                    for id_, inspection_id, violation_id, comment in inspection_violations
+                ],
             )
 
+    def get_interned_comments(
+        self, db: ChiBased, comments: list[tuple[int, str]]
+    ) -> tuple[list[tuple[int, str | bytes, int]], dict[str, int]]:
+        """Deduplicate `comments` (`(violation id, comment)` pairs).
+
+        Returns `violation_comments` rows for each distinct comment and a lookup from comment text to its id.
+        A comment's id is the id of the first violation that uses it, so ids don't shift when new comments are added.
+
+        If `self.compress_comments` is `True`, a zstd dictionary is trained on the distinct comments and saved to `comment_dictionaries`.
+        """
+        comment_ids: dict[str, int] = {}
+        for violation_id, comment in sorted(comments):
+            comment_ids.setdefault(comment, violation_id)
+        compressor = None
+        if self.compress_comments:
+            samples = [
+                comment.encode("utf-8")
+                for comment in comment_ids
+                if len(comment) >= self.compression_threshold
+            ]
+            try:
+                dictionary = zstandard.train_dictionary(112640, samples)  # type: ignore
+                db.insert(
+                    "comment_dictionaries",
+                    ["id", "dictionary"],
+                    [(1, dictionary.as_bytes())],
+                )
+            except zstandard.ZstdError:  # type: ignore
+                # Too few samples to train on, compress without a dictionary
+                dictionary = None
+            compressor = zstandard.ZstdCompressor(  # type: ignore
+                level=10, dict_data=dictionary, write_checksum=False, write_dict_id=False
+            )
+        rows = []
+        for comment, comment_id in comment_ids.items():
+            encoded = comment.encode("utf-8")
+            if compressor and len(encoded) >= self.compression_threshold:
+                compressed = compressor.compress(encoded)
+                if len(compressed) < len(encoded):
+                    rows.append((comment_id, compressed, 1))
+                    continue
+            rows.append((comment_id, comment, 0))
+        return rows, comment_ids
+
+    preparation_steps = [
+        "load",
+        "rename_columns",
+        "normalize_strings",
+        "fix_cities",
+        "remove_non_chicago_entries",
+        "remove_schools",
+        "clear_invalid_license_numbers",
+        "convert_dates",
+        "fill_missing",
+    ]
+
     @time_it()
     def prepare_data(self) -> pandas.DataFrame:
         """Run preparation pipeline and return dataframe."""
@@ -629,6 +833,7 @@ class FoodInspections(BusinessLicenses):
         data = self.fix_cities(data)
         data = self.remove_non_chicago_entries(data)
         data = self.remove_schools(data)
+        data = self.clear_invalid_license_numbers(data)
         data = self.convert_dates(data)
         data = self.fill_missing(data)
         return data
@@ -639,35 +844,112 @@ def prune():
     """Prune unneeded data."""
     with ChiBased() as db:
         db.query(
-            """ DELETE FROM licenses WHERE license_number NOT IN (SELECT license_number FROM inspected_businesses);"""
+            """ DELETE FROM licenses WHERE license_number NOT IN (SELECT license_number FROM inspected_businesses WHERE license_number IS NOT NULL);"""
         )
+        # Businesses inspected without a license number are kept since their inspections reference them
         db.query(
-            """ DELETE FROM inspected_businesses WHERE license_number NOT IN (SELECT license_number FROM licenses); """
+            """ DELETE FROM inspected_businesses WHERE license_number NOT IN (SELECT license_number FROM licenses) AND id NOT IN (SELECT inspected_business_id FROM business_links); """
         )
         db.query(
-            """ DELETE FROM businesses WHERE account_number NOT IN (SELECT account_number FROM licenses); """
+            """ DELETE FROM businesses WHERE account_number NOT IN (SELECT account_number FROM licenses) AND account_number NOT IN (SELECT account_number FROM business_links); """
         )
         db.query(
             """ DELETE FROM business_addresses WHERE id NOT IN (SELECT address_id FROM businesses); """
         )
+        db.query(
+            """ DELETE FROM business_addresses_rtree WHERE id NOT IN (SELECT id FROM business_addresses); """
+        )
         db.query(
             """ DELETE FROM violations WHERE inspection_id NOT IN (SELECT id FROM inspections); """
         )
+        db.query(
+            """ DELETE FROM violation_comments WHERE id NOT IN (SELECT comment_id FROM violations WHERE comment_id IS NOT NULL); """
+        )
+        db.optimize_search_index()
         db.close()
         db.vacuum()
 
 
 @time_it()
-def load_to_sqlite():
+def load_to_sqlite(
+    intern_comments: bool = False,
+    compress_comments: bool = False,
+    partitioned: bool = False,
+    profile: bool = False,
+    profile_memory: bool = True,
+):
+    """Create `chi.db` and load both datasets into it.
+
+    See `FoodInspections` for `intern_comments` and `compress_comments` (which implies `intern_comments`).
+
+    If `partitioned` is `True`, `inspections` and `violations` are stored in per-year files (see `partitions.write_partitions()`).
+
+    If `profile` is `True`, each data preparation step and insertion stage is profiled (see `profiling.Profiler`)
+    and a summary of the hottest functions and allocation sites is printed at the end.
+    tracemalloc accounts for most of the profiling overhead, pass `profile_memory=False` to only collect CPU stats.
+    """
+    profiler = Profiler(profile, profile_memory)
     (root / "chi.db").delete()
     with ChiBased() as db:
         db.create_tables_script()
+        if compress_comments:
+            db.create_compressed_comments_view()
     loader = BusinessLicenses()
+    profiler.instrument(loader, loader.preparation_steps + loader.insertion_stages)
     loader.load_data_to_db()
-    loader = FoodInspections()
+    loader = FoodInspections(intern_comments, compress_comments)
+    profiler.instrument(loader, loader.preparation_steps + loader.insertion_stages)
     loader.load_data_to_db()
-    prune()
+    # Link and backfill before pruning so every business is available as a reference
+    with ChiBased() as db:
+        profiler.run("link_businesses", linkage.link_businesses, db)
+        profiler.run("build_spatial_index", spatial.build_spatial_index, db)
+        profiler.run("backfill_facility_wards", spatial.backfill_facility_wards, db)
+    profiler.run("prune", prune)
+    if partitioned:
+        with ChiBased() as db:
+            profiler.run("write_partitions", partitions.write_partitions, db)
+            db.vacuum()
+    ChiBased().bump_load_generation()
+    profiler.print_summary()
+
+
+def get_args(args: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--intern-comments",
+        action="store_true",
+        help="Store each distinct violation comment once in `violation_comments`.",
+    )
+    parser.add_argument(
+        "--compress-comments",
+        action="store_true",
+        help="zstd compress interned comments with a trained dictionary (implies --intern-comments).",
+    )
+    parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="Store inspections and violations in per-year files, only rewriting years whose data changed.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile each preparation step and insertion stage, saving results to `profiles/`.",
+    )
+    parser.add_argument(
+        "--no-profile-memory",
+        action="store_true",
+        help="Skip allocation tracking when profiling (lower overhead).",
+    )
+    return parser.parse_args(args)
 
 
 if __name__ == "__main__":
-    load_to_sqlite()
+    args = get_args()
+    load_to_sqlite(
+        args.intern_comments or args.compress_comments,
+        args.compress_comments,
+        args.partitioned,
+        args.profile,
+        not args.no_profile_memory,
+    )
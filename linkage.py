@@ -0,0 +1,213 @@
+import zlib
+
+import numpy
+import pandas
+from noiftimer import time_it
+
+from chibased import ChiBased
+
+street_abbreviations = {
+    "STREET": "ST",
+    "AVENUE": "AVE",
+    "AV": "AVE",
+    "BOULEVARD": "BLVD",
+    "ROAD": "RD",
+    "DRIVE": "DR",
+    "PLACE": "PL",
+    "PARKWAY": "PKWY",
+    "COURT": "CT",
+    "LANE": "LN",
+    "NORTH": "N",
+    "SOUTH": "S",
+    "EAST": "E",
+    "WEST": "W",
+}
+name_stopwords = {"INC", "LLC", "CORP", "CORPORATION", "CO", "COMPANY", "LTD", "THE"}
+signature_bytes = 64
+popcounts = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint8)
+""" Record linkage between `inspected_businesses` and `businesses` for inspections whose license number is missing or doesn't match a license. """
+
+
+def normalize_streets(streets: pandas.Series) -> pandas.Series:
+    """Uppercase, strip punctuation, and abbreviate street suffixes and directions."""
+    words = (
+        streets.fillna("")
+        .str.upper()
+        .str.replace(r"[^A-Z0-9 ]", " ", regex=True)
+        .str.split()
+    )
+    return words.apply(
+        lambda street: " ".join(street_abbreviations.get(word, word) for word in street)
+    )
+
+
+def normalize_names(names: pandas.Series) -> pandas.Series:
+    """Uppercase, strip punctuation, and remove business entity words like `LLC`."""
+    words = (
+        names.fillna("")
+        .str.upper()
+        .str.replace("&", " AND ")
+        .str.replace(r"[^A-Z0-9 ]", "", regex=True)
+        .str.split()
+    )
+    return words.apply(
+        lambda name: " ".join(word for word in name if word not in name_stopwords)
+    )
+
+
+def normalize_zips(zips: pandas.Series) -> pandas.Series:
+    return pandas.to_numeric(zips, errors="coerce")
+
+
+def get_signatures(names: list[str]) -> numpy.ndarray:
+    """Return a `(len(names), signature_bytes)` array of hashed character trigram bitsets, one row per name."""
+    signatures = numpy.zeros((len(names), signature_bytes), dtype=numpy.uint8)
+    bits = signature_bytes * 8
+    for row, name in enumerate(names):
+        if not name:
+            continue
+        padded = f"  {name} "
+        for i in range(len(padded) - 2):
+            bit = zlib.crc32(padded[i : i + 3].encode()) % bits
+            signatures[row, bit >> 3] |= 1 << (bit & 7)
+    return signatures
+
+
+def jaccard(left: numpy.ndarray, right: numpy.ndarray) -> numpy.ndarray:
+    """Row-wise Jaccard similarity of two arrays of trigram signatures."""
+    intersection = popcounts[left & right].sum(axis=1, dtype=numpy.int32)
+    union = popcounts[left | right].sum(axis=1, dtype=numpy.int32)
+    return numpy.divide(
+        intersection, union, out=numpy.zeros(len(union)), where=union > 0
+    )
+
+
+def get_unlinked_inspected_businesses(db: ChiBased) -> pandas.DataFrame:
+    """Inspected businesses, with each facility street they were inspected at, whose license number is missing or isn't in `licenses`."""
+    return pandas.DataFrame(
+        db.query(
+            """
+            SELECT DISTINCT
+                inspected_businesses.id AS inspected_business_id,
+                inspected_businesses.license_number,
+                inspected_businesses.dba,
+                inspected_businesses.aka,
+                facility_addresses.street,
+                facility_addresses.zip
+            FROM
+                inspected_businesses
+                INNER JOIN inspections ON inspected_businesses.id = inspections.inspected_business_id
+                INNER JOIN facility_addresses ON inspections.facility_address_id = facility_addresses.id
+            WHERE
+                inspected_businesses.license_number IS NULL
+                OR inspected_businesses.license_number NOT IN (SELECT license_number FROM licenses);"""
+        ),
+        columns=[
+            "inspected_business_id",
+            "license_number",
+            "dba",
+            "aka",
+            "street",
+            "zip",
+        ],
+    )
+
+
+def get_businesses(db: ChiBased) -> pandas.DataFrame:
+    return pandas.DataFrame(
+        db.query(
+            """
+            SELECT
+                businesses.account_number,
+                businesses.legal_name,
+                businesses.dba,
+                business_addresses.street,
+                business_addresses.zip
+            FROM
+                businesses
+                INNER JOIN business_addresses ON businesses.address_id = business_addresses.id;"""
+        ),
+        columns=["account_number", "legal_name", "dba", "street", "zip"],
+    )
+
+
+def get_candidates(
+    inspected: pandas.DataFrame, businesses: pandas.DataFrame
+) -> pandas.DataFrame:
+    """Pair inspected businesses with businesses at the same normalized street and zip.
+
+    A missing zip on either side is treated as agreeing so those records aren't excluded."""
+    for frame in (inspected, businesses):
+        frame["street_key"] = normalize_streets(frame["street"])
+        frame["zip"] = normalize_zips(frame["zip"])
+    candidates = inspected[inspected["street_key"] != ""].merge(
+        businesses, on="street_key", suffixes=("_inspected", "_business")
+    )
+    return candidates[
+        (candidates["zip_inspected"] == candidates["zip_business"])
+        | candidates["zip_inspected"].isna()
+        | candidates["zip_business"].isna()
+    ]
+
+
+def score_candidates(
+    candidates: pandas.DataFrame, batch_size: int = 100_000
+) -> numpy.ndarray:
+    """Return the best name similarity between each candidate pair's `dba`/`aka` and `legal_name`/`dba`."""
+    name_columns = {
+        column: normalize_names(candidates[column])
+        for column in ["dba_inspected", "aka", "legal_name", "dba_business"]
+    }
+    names = pandas.unique(pandas.concat(name_columns.values())).tolist()
+    signatures = get_signatures(names)
+    name_ids = {name: i for i, name in enumerate(names)}
+    ids = {
+        column: values.map(name_ids).to_numpy()
+        for column, values in name_columns.items()
+    }
+    scores = numpy.zeros(len(candidates))
+    for left in ["dba_inspected", "aka"]:
+        for right in ["legal_name", "dba_business"]:
+            for start in range(0, len(candidates), batch_size):
+                batch = slice(start, start + batch_size)
+                scores[batch] = numpy.maximum(
+                    scores[batch],
+                    jaccard(signatures[ids[left][batch]], signatures[ids[right][batch]]),
+                )
+    return scores
+
+
+@time_it()
+def link_businesses(db: ChiBased, min_confidence: float = 0.5) -> int:
+    """Populate `business_links` with the best matching business for each inspected business whose license number is missing or isn't in `licenses`.
+
+    Candidates are blocked by normalized street and zip so only businesses at the same address are compared,
+    then scored by name similarity.
+    Links with a confidence below `min_confidence` are discarded.
+
+    Returns the number of links."""
+    db.query("DELETE FROM business_links;")
+    candidates = get_candidates(
+        get_unlinked_inspected_businesses(db), get_businesses(db)
+    )
+    if candidates.empty:
+        return 0
+    candidates["confidence"] = score_candidates(candidates)
+    links = (
+        candidates[candidates["confidence"] >= min_confidence]
+        .sort_values("confidence", ascending=False)
+        .drop_duplicates("inspected_business_id")
+        .sort_values("inspected_business_id")
+    )
+    return db.insert(
+        "business_links",
+        ["inspected_business_id", "license_number", "account_number", "confidence"],
+        links[
+            [
+                "inspected_business_id",
+                "license_number",
+                "account_number",
+                "confidence",
+            ]
+        ].values.tolist(),
+    )
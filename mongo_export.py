@@ -0,0 +1,336 @@
+import datetime
+from typing import Any, Iterator
+
+from noiftimer import time_it
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.database import Database
+
+from chibased import ChiBased
+
+""" Export `chi.db` to MongoDB as one denormalized document per inspection. """
+
+
+def get_database(mock: bool = False) -> Database:
+    """Return the `chicago` database from a local mongod or, if `mock` is `True`, from `mongomock`."""
+    if mock:
+        import mongomock
+
+        return mongomock.MongoClient().chicago
+    return MongoClient().chicago
+
+
+def get_inspection_document(
+    row: dict[str, Any], violations: list[dict[str, Any]]
+) -> dict[str, Any]:
+    """Build the document for the inspection in `row` with `violations` embedded."""
+    return {
+        "_id": row["id"],
+        # Undated inspections are kept, like in `partitions.py`
+        "date": datetime.datetime.fromisoformat(row["date"]) if row["date"] else None,
+        "inspection_type": row["inspection_type"],
+        "result": row["result"],
+        # Same ward the `mysql_views.sql` views use
+        "ward": row["ward"],
+        "license_number": row["license_number"],
+        "dba": row["dba"],
+        "aka": row["aka"],
+        "facility": {
+            "street": row["street"],
+            "zip": row["zip"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "type": row["facility_type"],
+            "risk": row["risk"],
+            "ward": row["facility_ward"],
+        },
+        "license": {
+            "account_number": row["account_number"],
+            "legal_name": row["legal_name"],
+            "description": row["license_description"],
+            "start_date": row["start_date"],
+            "expiration_date": row["expiration_date"],
+        },
+        "violations": violations,
+    }
+
+
+def get_inspection_documents(
+    db: ChiBased, batch_size: int = 10_000
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield batches of up to `batch_size` documents, one per inspection,
+    with its violations embedded and its facility, business, license, and ward denormalized in.
+
+    Inspections and violations are both read in inspection id order and merged,
+    so only one batch of documents is held in memory at a time."""
+    assert db.connection
+    violations = db.connection.execute(
+        """
+        SELECT
+            violation_details.inspection_id,
+            violation_details.violation_type_id,
+            violation_types.name,
+            violation_details.comment
+        FROM
+            violation_details
+            INNER JOIN violation_types ON violation_details.violation_type_id = violation_types.id
+        ORDER BY
+            violation_details.inspection_id,
+            violation_details.id;"""
+    )
+    violation = next(violations, None)
+    inspections = db.connection.execute(
+        """
+        SELECT
+            inspections.id,
+            inspections.date,
+            inspection_types.name AS inspection_type,
+            result_types.description AS result,
+            inspections.license_number,
+            inspected_businesses.dba,
+            inspected_businesses.aka,
+            facility_addresses.street,
+            facility_addresses.zip,
+            facility_addresses.latitude,
+            facility_addresses.longitude,
+            facility_addresses.ward AS facility_ward,
+            facility_types.name AS facility_type,
+            risk_levels.name AS risk,
+            licenses.account_number,
+            licenses.start_date,
+            licenses.expiration_date,
+            license_codes.description AS license_description,
+            businesses.legal_name,
+            business_addresses.ward
+        FROM
+            inspections
+            INNER JOIN inspection_types ON inspections.inspection_type_id = inspection_types.id
+            INNER JOIN result_types ON inspections.result_type_id = result_types.id
+            LEFT JOIN inspected_businesses ON inspections.inspected_business_id = inspected_businesses.id
+            LEFT JOIN facility_addresses ON inspections.facility_address_id = facility_addresses.id
+            LEFT JOIN facility_types ON facility_addresses.facility_type_id = facility_types.id
+            LEFT JOIN risk_levels ON facility_addresses.risk_id = risk_levels.id
+            LEFT JOIN licenses ON inspections.license_number = licenses.license_number
+            LEFT JOIN license_codes ON licenses.license_code = license_codes.code
+            LEFT JOIN businesses ON licenses.account_number = businesses.account_number
+            LEFT JOIN business_addresses ON businesses.address_id = business_addresses.id
+        ORDER BY
+            inspections.id;"""
+    )
+    while rows := inspections.fetchmany(batch_size):
+        documents = []
+        for row in rows:
+            embedded = []
+            # Violations of inspections that aren't in the query results are skipped
+            while violation and violation["inspection_id"] <= row["id"]:
+                if violation["inspection_id"] == row["id"]:
+                    embedded.append(
+                        {
+                            "type_id": violation["violation_type_id"],
+                            "violation": violation["name"],
+                            "comment": violation["comment"],
+                        }
+                    )
+                violation = next(violations, None)
+            documents.append(get_inspection_document(row, embedded))
+        yield documents
+
+
+def get_ward_documents(db: ChiBased) -> list[dict[str, Any]]:
+    """Number of inspected businesses per ward, equivalent to the `num_inspected_businesses_by_ward` view."""
+    return [
+        {"_id": row["ward"], "num_businesses": row["num_businesses"]}
+        for row in db.query(
+            """
+            SELECT
+                COUNT(*) AS num_businesses,
+                business_addresses.ward
+            FROM
+                inspected_businesses
+                INNER JOIN licenses ON inspected_businesses.license_number = licenses.license_number
+                INNER JOIN businesses ON licenses.account_number = businesses.account_number
+                INNER JOIN business_addresses ON businesses.address_id = business_addresses.id
+            GROUP BY
+                business_addresses.ward;"""
+        )
+    ]
+
+
+def create_indexes(mongo: Database):
+    inspections = mongo.inspections
+    inspections.create_index(
+        [("ward", ASCENDING), ("date", DESCENDING), ("result", ASCENDING)]
+    )
+    inspections.create_index(
+        [("ward", ASCENDING), ("inspection_type", ASCENDING), ("date", DESCENDING)]
+    )
+    inspections.create_index([("violations.type_id", ASCENDING), ("ward", ASCENDING)])
+
+
+@time_it()
+def export(mongo: Database, batch_size: int = 10_000) -> int:
+    """Replace the `inspections` and `wards` collections in `mongo` with documents built from `chi.db` and create their indexes.
+
+    Inspection documents are built and inserted `batch_size` at a time.
+
+    Returns the number of inspection documents inserted."""
+    count = 0
+    with ChiBased() as db:
+        wards = get_ward_documents(db)
+        mongo.inspections.drop()
+        mongo.wards.drop()
+        for documents in get_inspection_documents(db, batch_size):
+            mongo.inspections.insert_many(documents, ordered=False)
+            count += len(documents)
+    if wards:
+        mongo.wards.insert_many(wards)
+    create_indexes(mongo)
+    return count
+
+
+def ratio_to_businesses(count_field: str, ratio_field: str) -> list[dict[str, Any]]:
+    """Pipeline stages that join `wards` and add `num_businesses` and `ratio_field` (`count_field` / `num_businesses`)."""
+    return [
+        {
+            "$lookup": {
+                "from": "wards",
+                "localField": "ward",
+                "foreignField": "_id",
+                "as": "ward_info",
+            }
+        },
+        {"$unwind": "$ward_info"},
+        {
+            "$addFields": {
+                "num_businesses": "$ward_info.num_businesses",
+                ratio_field: {"$divide": [f"${count_field}", "$ward_info.num_businesses"]},
+            }
+        },
+        {"$project": {"ward_info": 0}},
+    ]
+
+
+def count_by_ward(
+    match: dict[str, Any], count_field: str, ratio_field: str
+) -> list[dict[str, Any]]:
+    return [
+        {"$match": {"ward": {"$ne": None}, **match}},
+        {"$group": {"_id": "$ward", count_field: {"$sum": 1}}},
+        {"$addFields": {"ward": "$_id"}},
+        *ratio_to_businesses(count_field, ratio_field),
+        {"$sort": {ratio_field: -1}},
+    ]
+
+
+def count_by_ward_and(
+    field: str, match: dict[str, Any], count_field: str, ratio_field: str
+) -> list[dict[str, Any]]:
+    return [
+        {"$match": {"ward": {"$ne": None}, **match}},
+        {"$group": {"_id": {"ward": "$ward", field: f"${field}"}, count_field: {"$sum": 1}}},
+        {"$addFields": {"ward": "$_id.ward", field: f"$_id.{field}"}},
+        *ratio_to_businesses(count_field, ratio_field),
+        {"$sort": {"ward": 1, count_field: -1}},
+    ]
+
+
+complaint_types = ["Complaint", "Short Form Complaint", "Suspected Food Poisoning"]
+pass_results = ["Pass", "Pass W/ Conditions"]
+
+# Aggregation pipelines over the `inspections` collection equivalent to the views in `mysql_views.sql`
+ward_pipelines: dict[str, list[dict[str, Any]]] = {
+    "inspections_by_ward": count_by_ward(
+        {}, "inspection_count", "inspections_to_business_ratio"
+    ),
+    "inspection_results_by_ward": count_by_ward_and(
+        "result", {}, "num_results", "results_to_business_ratio"
+    ),
+    "failed_inspections_by_ward": count_by_ward(
+        {"result": "Fail"}, "num_results", "results_to_business_ratio"
+    ),
+    "passed_inspections_by_ward": count_by_ward(
+        {"result": {"$in": pass_results}}, "total_results", "results_to_business_ratio"
+    ),
+    "violation_type_occurrences": [
+        {"$unwind": "$violations"},
+        {
+            "$group": {
+                "_id": "$violations.type_id",
+                "violation": {"$first": "$violations.violation"},
+                "occurrences": {"$sum": 1},
+            }
+        },
+        {"$sort": {"occurrences": -1}},
+    ],
+    "violation_type_occurrence_by_ward": [
+        {"$match": {"ward": {"$ne": None}}},
+        {"$unwind": "$violations"},
+        {
+            "$group": {
+                "_id": {"ward": "$ward", "type_id": "$violations.type_id"},
+                "violation": {"$first": "$violations.violation"},
+                "occurrences": {"$sum": 1},
+            }
+        },
+        {"$addFields": {"ward": "$_id.ward", "type_id": "$_id.type_id"}},
+        *ratio_to_businesses("occurrences", "violations_to_business_ratio"),
+        {"$sort": {"ward": 1, "occurrences": -1}},
+    ],
+    "total_violations_by_ward": [
+        {"$match": {"ward": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$ward",
+                "num_violations": {"$sum": {"$size": "$violations"}},
+            }
+        },
+        {"$addFields": {"ward": "$_id"}},
+        *ratio_to_businesses("num_violations", "total_violations_to_business_ratio"),
+        {"$sort": {"total_violations_to_business_ratio": -1}},
+    ],
+    "inspection_type_occurrence_by_ward": count_by_ward_and(
+        "inspection_type", {}, "num_inspections", "inspection_type_to_business_ratio"
+    ),
+    "canvass_inspections_by_ward": count_by_ward(
+        {"inspection_type": "Canvass"},
+        "num_inspections",
+        "inspection_type_to_business_ratio",
+    ),
+    "complaint_inspections_by_ward": count_by_ward(
+        {"inspection_type": {"$in": complaint_types}},
+        "total_inspections",
+        "inspections_to_business_ratio",
+    ),
+    "pass_fail_ratio_by_ward": [
+        {"$match": {"ward": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$ward",
+                "passed": {
+                    "$sum": {"$cond": [{"$in": ["$result", pass_results]}, 1, 0]}
+                },
+                "failed": {"$sum": {"$cond": [{"$eq": ["$result", "Fail"]}, 1, 0]}},
+            }
+        },
+        {"$match": {"failed": {"$gt": 0}}},
+        {
+            "$project": {
+                "_id": 0,
+                "ward": "$_id",
+                "pass_fail_ratio": {"$divide": ["$passed", "$failed"]},
+            }
+        },
+        {"$sort": {"pass_fail_ratio": -1}},
+    ],
+}
+
+
+def aggregate(mongo: Database, view: str) -> list[dict[str, Any]]:
+    """Run the aggregation pipeline equivalent to the `mysql_views.sql` view named `view`.
+
+    >>> rows = aggregate(get_database(), "pass_fail_ratio_by_ward")"""
+    return list(mongo.inspections.aggregate(ward_pipelines[view]))
+
+
+if __name__ == "__main__":
+    mongo = get_database()
+    print(f"{export(mongo)} inspection documents exported.")
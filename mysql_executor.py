@@ -53,10 +53,16 @@ def execute_mysql_script(sql_file: str, creds: dict[str, str] | None):
 
     Mine is set to a value of `128M`.
 
-    The mysql server will need to be restarted for this to take effect."""
+    The mysql server will need to be restarted for this to take effect.
+
+    Raises a `RuntimeError` if `mysql` exits with a non-zero status, e.g. for a wrong password or a lost connection."""
     if not creds:
         creds = get_creds()
-    os.system(f"mysql -u{creds['username']} -p{creds['password']} < {sql_file}")
+    status = os.system(f"mysql -u{creds['username']} -p{creds['password']} < {sql_file}")
+    if status:
+        raise RuntimeError(
+            f"mysql exited with status {status} while running `{sql_file}`."
+        )
 
 
 @time_it()
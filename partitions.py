@@ -0,0 +1,187 @@
+import hashlib
+import os
+
+from noiftimer import time_it
+from pathier import Pathier
+
+from chibased import ChiBased
+
+# `ATTACH` is limited to 10 databases by SQLite's default compile options.
+# The most recent years get their own partition and older years share `chi_archive.db`,
+# which keeps one attach slot free for `write_partitions()` and ad hoc use.
+recent_years = 8
+year_expression = "COALESCE(CAST(SUBSTR(inspections.date, 1, 4) AS INTEGER), 0)"
+fts_triggers = [
+    "violations_fts_insert",
+    "violations_fts_delete",
+    "violations_fts_update_delete",
+    "violations_fts_update_insert",
+]
+""" Partitioning of the `inspections` and `violations` tables into attached SQLite files by inspection year. """
+
+
+def get_years(db: ChiBased) -> list[int]:
+    """Distinct inspection years in the main `inspections` table (`0` for undated inspections)."""
+    return [
+        row["year"]
+        for row in db.query(
+            f"SELECT DISTINCT {year_expression} AS year FROM main.inspections ORDER BY year;"
+        )
+    ]
+
+
+def get_layout(years: list[int]) -> dict[str, tuple[int, int]]:
+    """Map partition names to the first and last year they hold.
+
+    Each of the last `recent_years` years is its own partition, named after the year.
+    Any earlier years (including `0` for undated inspections) go in the `archive` partition.
+
+    >>> get_layout(list(range(2010, 2027)))
+    >>> {"archive": (2010, 2018), "2019": (2019, 2019), ..., "2026": (2026, 2026)}"""
+    years = sorted(years)
+    recent = years[-recent_years:]
+    layout = {}
+    if len(years) > len(recent):
+        layout["archive"] = (years[0], recent[0] - 1)
+    for year in recent:
+        layout[str(year)] = (year, year)
+    return layout
+
+
+def get_fingerprint(db: ChiBased, first_year: int, last_year: int) -> str:
+    """Hash of the `inspections` and `violations` rows that belong in the partition holding `first_year` through `last_year`.
+
+    Surrogate ids stored in these rows (`facility_address_id`, `inspected_business_id`, `violations.id`, and `comment_id`)
+    are derived from inspection ids by `dataloader`, so they only change when the underlying data does."""
+    digest = hashlib.sha256()
+    for query in [
+        f"SELECT * FROM main.inspections WHERE {year_expression} BETWEEN ? AND ? ORDER BY id;",
+        f"""SELECT violations.* FROM main.violations
+        INNER JOIN main.inspections ON violations.inspection_id = inspections.id
+        WHERE {year_expression} BETWEEN ? AND ? ORDER BY violations.id;""",
+    ]:
+        assert db.connection
+        for row in db.connection.execute(query, (first_year, last_year)):
+            digest.update(repr(tuple(row.values())).encode())
+    return digest.hexdigest()
+
+
+def get_stored_fingerprint(db: ChiBased, path: Pathier) -> str | None:
+    """The fingerprint recorded in an existing partition file or `None` if there isn't one."""
+    if not path.exists():
+        return None
+    db.query("ATTACH DATABASE ? AS chi_check;", (str(path),))
+    try:
+        rows = db.query("SELECT fingerprint FROM chi_check.partition_info;")
+        return rows[0]["fingerprint"] if rows else None
+    except Exception:
+        return None
+    finally:
+        db.query("DETACH DATABASE chi_check;")
+
+
+def rebuild_partition(
+    db: ChiBased, name: str, first_year: int, last_year: int, fingerprint: str
+):
+    """Write the `name` partition file from the main tables.
+
+    The file is built under a temporary name and then swapped in so a failed rebuild leaves the old partition intact."""
+    path = db.partition_dir / f"chi_{name}.db"
+    temp_path = path.with_suffix(".db.tmp")
+    temp_path.delete()
+    db.query("ATTACH DATABASE ? AS chi_new;", (str(temp_path),))
+    try:
+        db.query(
+            f"""CREATE TABLE chi_new.inspections AS
+            SELECT * FROM main.inspections WHERE {year_expression} BETWEEN {first_year} AND {last_year} ORDER BY id;"""
+        )
+        db.query(
+            f"""CREATE TABLE chi_new.violations AS
+            SELECT violations.* FROM main.violations
+            INNER JOIN main.inspections ON violations.inspection_id = inspections.id
+            WHERE {year_expression} BETWEEN {first_year} AND {last_year} ORDER BY violations.id;"""
+        )
+        db.query("CREATE UNIQUE INDEX chi_new.inspections_id_idx ON inspections (id);")
+        db.query("CREATE INDEX chi_new.inspections_date_idx ON inspections (date);")
+        db.query("CREATE UNIQUE INDEX chi_new.violations_id_idx ON violations (id);")
+        db.query(
+            "CREATE INDEX chi_new.violations_inspection_id_idx ON violations (inspection_id);"
+        )
+        db.query(
+            "CREATE TABLE chi_new.partition_info (first_year INTEGER, last_year INTEGER, fingerprint TEXT);"
+        )
+        db.query(
+            "INSERT INTO chi_new.partition_info (first_year, last_year, fingerprint) VALUES (?, ?, ?);",
+            (first_year, last_year, fingerprint),
+        )
+        db.commit()
+    finally:
+        db.query("DETACH DATABASE chi_new;")
+    os.replace(temp_path, path)
+
+
+def store_search_index(db: ChiBased):
+    """Replace the external content `violations_fts` index with one that stores its own copy of the comment text.
+
+    Once the main `violations` table is emptied, the `violation_details` view the index reads its content from is empty too,
+    so reading comments, `snippet()`, `highlight()`, or a `'rebuild'` would fail or empty the index."""
+    db.query("DROP TABLE violations_fts;")
+    db.query(
+        "CREATE VIRTUAL TABLE violations_fts USING fts5 (comment, tokenize = 'porter unicode61');"
+    )
+    db.query(
+        "INSERT INTO violations_fts (rowid, comment) SELECT id, comment FROM main.violation_details;"
+    )
+    db.optimize_search_index()
+
+
+def check_search_index(db: ChiBased):
+    """Read comment text back out of `violations_fts` and run FTS5's integrity check.
+
+    Raises `sqlite3.DatabaseError` if the index and its content don't agree."""
+    db.query("SELECT rowid, comment FROM violations_fts LIMIT 1;")
+    db.query(
+        "INSERT INTO violations_fts (violations_fts, rank) VALUES ('integrity-check', 1);"
+    )
+
+
+@time_it()
+def write_partitions(db: ChiBased) -> list[str]:
+    """Move `inspections` and `violations` rows into partition files in `db.partition_dir` (see `get_layout()`).
+
+    A partition file is only rewritten when the fingerprint of its rows differs from the one stored in the existing file,
+    so an incremental load typically only rewrites the current year.
+    The archive is also rewritten when a new year pushes the oldest recent year into it.
+
+    Afterwards the main tables are emptied and `ChiBased` serves them through union views over the partitions.
+    The `violations_fts` index is kept, but is converted to store its own comment text (see `store_search_index()`),
+    and its sync triggers are dropped since the main `violations` table no longer holds rows.
+
+    Returns the names of the partitions that were rewritten."""
+    # `ATTACH` can't be run inside a transaction
+    db.commit()
+    layout = get_layout(get_years(db))
+    db.partition_dir.mkdir()
+    rewritten = []
+    for name, (first_year, last_year) in layout.items():
+        fingerprint = get_fingerprint(db, first_year, last_year)
+        if get_stored_fingerprint(db, db.partition_dir / f"chi_{name}.db") != fingerprint:
+            rebuild_partition(db, name, first_year, last_year, fingerprint)
+            rewritten.append(name)
+    for path in db.partition_dir.glob("chi_*.db"):
+        if path.stem.removeprefix("chi_") not in layout:
+            path.delete()
+    db.insert(
+        "partitions",
+        ["name", "first_year", "last_year"],
+        [(name, first_year, last_year) for name, (first_year, last_year) in layout.items()],
+    )
+    for trigger in fts_triggers:
+        db.query(f"DROP TRIGGER IF EXISTS {trigger};")
+    store_search_index(db)
+    db.query("DELETE FROM main.violations;")
+    db.query("DELETE FROM main.inspections;")
+    check_search_index(db)
+    db.commit()
+    print(f"Rewrote partitions: {rewritten or 'none'}")
+    return rewritten
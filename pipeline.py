@@ -1,16 +1,73 @@
+import argparse
+import functools
+
 from noiftimer import time_it
 from pathier import Pathier
 
 import mysql_executor
 from chibased import ChiBased
-from dataloader import load_to_sqlite
-from pull_data import pull
+from stage_cache import Stage, StageCache
 
 root = Pathier(__file__).parent
 
 
+# `dataloader` (pandas, numpy) and `pull_data` (requests) are imported when their stage runs
+# so skipped stages and `cli.py` subcommands that don't need them start quickly.
+
+
+def pull():
+    from pull_data import pull
+
+    pull()
+
+
+def load_to_sqlite(profile: bool = False, profile_memory: bool = True):
+    from dataloader import load_to_sqlite
+
+    load_to_sqlite(profile=profile, profile_memory=profile_memory)
+
+
+def generate_mysql_dump():
+    with ChiBased() as db:
+        db.generate_mysql_dump()
+
+
+stages = [
+    Stage(
+        "load",
+        load_to_sqlite,
+        ["business_licenses.csv", "food_inspections.csv", "chidata_ddl_sqlite.sql"],
+        [
+            "dataloader.py",
+            "chibased.py",
+            "spatial.py",
+            "linkage.py",
+            "partitions.py",
+            "profiling.py",
+        ],
+        ["chi.db"],
+    ),
+    Stage(
+        "dump",
+        generate_mysql_dump,
+        ["chi.db"],
+        ["chibased.py"],
+        ["chidata_dml_mysql.sql"],
+    ),
+    Stage(
+        "mysql",
+        mysql_executor.main,
+        ["chidata_ddl_mysql.sql", "chidata_dml_mysql.sql", "mysql_views.sql"],
+        ["mysql_executor.py"],
+        [],
+    ),
+]
+
+
 @time_it()
-def main():
+def main(
+    force: list[str] | None = None, profile: bool = False, profile_memory: bool = True
+):
     """Run pipeline:
 
     * Download datasets
@@ -18,13 +75,71 @@ def main():
     * Create and populate sqlite database
     * Generate `chidata_dml_mysql.sql` script
     * Create chidata mysql schema
-    * Insert data into mysql chidata database."""
+    * Insert data into mysql chidata database.
+
+    Stages after the download are skipped if their inputs, code, and outputs haven't changed since they last ran.
+
+    `force` is a list of stage names to rerun regardless, `["all"]` reruns every stage.
+
+    If `profile` is `True`, the load stage is always rerun with `load_to_sqlite(profile=True)`.
+    Pass `profile_memory=False` to skip allocation tracking for lower overhead on large loads."""
+    force = force or []
     pull()
-    load_to_sqlite()
-    with ChiBased() as db:
-        db.generate_mysql_dump()
-    mysql_executor.main()
+    cache = StageCache()
+    for stage in stages:
+        if profile and stage.name == "load":
+            stage = Stage(
+                stage.name,
+                functools.partial(
+                    load_to_sqlite, profile=True, profile_memory=profile_memory
+                ),
+                stage.inputs,
+                stage.code,
+                stage.outputs,
+            )
+            cache.run(stage, True)
+            continue
+        cache.run(stage, "all" in force or stage.name in force)
+    cache.save()
+    cache.print_report()
+
+
+def run_stage(name: str, force: bool = False):
+    """Run the stage called `name` without downloading the datasets first.
+
+    The stage is skipped if it's fresh and `force` is `False`."""
+    cache = StageCache()
+    for stage in stages:
+        if stage.name == name:
+            cache.run(stage, force)
+            cache.save()
+            cache.print_report()
+            return
+    raise ValueError(f"No stage named '{name}'.")
+
+
+def get_args(args: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--force",
+        nargs="*",
+        default=[],
+        choices=[stage.name for stage in stages] + ["all"],
+        help="Stages to rerun even if their cached fingerprint matches.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Rerun and profile the load stage, saving results to `profiles/`.",
+    )
+    parser.add_argument(
+        "--no-profile-memory",
+        action="store_true",
+        help="Skip allocation tracking when profiling (lower overhead).",
+    )
+    return parser.parse_args(args)
 
 
 if __name__ == "__main__":
-    main()
+    args = get_args()
+    main(args.force, args.profile, not args.no_profile_memory)
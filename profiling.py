@@ -0,0 +1,179 @@
+import cProfile
+import functools
+import io
+import pstats
+import tracemalloc
+from typing import Any, Callable
+
+from pathier import Pathier
+
+root = Pathier(__file__).parent
+""" Per-stage CPU and allocation profiling for `load_to_sqlite()`. """
+
+FunctionKey = tuple[str, int, str]
+
+
+def format_function(function: FunctionKey) -> str:
+    file, line, name = function
+    if file == "~":
+        # Builtins, e.g. `<method 'split' of 'str' objects>`
+        return name
+    return f"{Pathier(file).name}:{line}({name})"
+
+
+def get_collapsed_stacks(
+    stats: pstats.Stats, max_depth: int = 64, min_seconds: float = 0.0001
+) -> dict[str, float]:
+    """Reconstruct approximate call stacks from `stats` in collapsed stack format (`root;caller;callee`: seconds).
+
+    cProfile only records caller/callee pairs,
+    so time for a function reached by several paths is split between them in proportion to each caller's share of its cumulative time.
+
+    Paths carrying less than `min_seconds` aren't expanded further,
+    otherwise heavily shared callees (pandas internals, mostly) make the number of paths explode.
+    """
+    entries: dict[FunctionKey, Any] = stats.stats  # type: ignore
+    callees: dict[FunctionKey, dict[FunctionKey, float]] = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, {})[function] = cumulative
+    stacks: dict[str, float] = {}
+
+    def walk(function: FunctionKey, path: list[str], budget: float):
+        _, _, total, cumulative, _ = entries[function]
+        path = path + [format_function(function)]
+        share = budget / cumulative if cumulative else 0
+        stack = ";".join(path)
+        stacks[stack] = stacks.get(stack, 0) + total * share
+        if len(path) >= max_depth:
+            return
+        for callee, edge in callees.get(function, {}).items():
+            if (
+                edge * share >= min_seconds
+                and format_function(callee) not in path
+                and callee in entries
+            ):
+                walk(callee, path, edge * share)
+
+    for function, (_, _, _, cumulative, callers) in entries.items():
+        if not callers:
+            walk(function, [], cumulative)
+    return {stack: seconds for stack, seconds in stacks.items() if seconds > 0}
+
+
+class Profiler:
+    def __init__(
+        self,
+        enabled: bool = True,
+        memory: bool = True,
+        output_dir: Pathier = root / "profiles",
+        top: int = 15,
+    ):
+        """Collects cProfile stats and, if `memory` is `True`, tracemalloc allocation sites for each stage run through it.
+
+        Each stage is saved to `output_dir` as `{stage}.pstats` and `{stage}.folded` (collapsed stacks for flamegraph tools like speedscope or flamegraph.pl).
+
+        Stages that run inside another stage aren't profiled separately, they're included in the outer stage.
+
+        tracemalloc only records one frame per allocation to keep overhead manageable on full size loads.
+
+        If `enabled` is `False`, stages are run without profiling."""
+        self.enabled = enabled
+        self.memory = memory
+        self.output_dir = output_dir
+        self.top = top
+        self.active = False
+        self.stats: dict[str, pstats.Stats] = {}
+        self.allocations: list[tuple[str, tracemalloc.StatisticDiff]] = []
+        self.peaks: dict[str, int] = {}
+
+    def run(self, stage: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call `func(*args, **kwargs)` and profile it as `stage`."""
+        if not self.enabled or self.active:
+            return func(*args, **kwargs)
+        self.active = True
+        if self.memory:
+            tracemalloc.start(1)
+            before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            if self.memory:
+                after = tracemalloc.take_snapshot()
+                self.peaks[stage] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.allocations.extend(
+                    (stage, diff)
+                    for diff in after.compare_to(before, "lineno")[: self.top]  # type: ignore
+                )
+            self.active = False
+            self.save(stage, profile)
+
+    def instrument(self, obj: Any, methods: list[str]):
+        """Replace each method of `obj` named in `methods` with one that runs through `self.run()` as a `{class name}.{method}` stage.
+
+        Only wrap stage level methods, helpers called per row (like `FoodInspections.parse_violation()`)
+        would add a wrapper and a profiled `run()` frame to every call."""
+        if not self.enabled:
+            return
+        for name in methods:
+            setattr(
+                obj, name, self.wrap(f"{type(obj).__name__}.{name}", getattr(obj, name))
+            )
+
+    def wrap(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return self.run(stage, func, *args, **kwargs)
+
+        return wrapper
+
+    def save(self, stage: str, profile: cProfile.Profile):
+        self.output_dir.mkdir()
+        stats = pstats.Stats(profile)
+        stats.dump_stats(self.output_dir / f"{stage}.pstats")
+        (self.output_dir / f"{stage}.folded").write_text(
+            "\n".join(
+                f"{stack} {round(seconds * 1_000_000)}"
+                for stack, seconds in get_collapsed_stacks(stats).items()
+            )
+        )
+        if stage in self.stats:
+            self.stats[stage].add(stats)
+        else:
+            self.stats[stage] = stats
+
+    def print_summary(self):
+        """Print the hottest functions and largest allocation sites across every profiled stage."""
+        if not self.enabled or not self.stats:
+            return
+        combined = pstats.Stats(stream=io.StringIO())
+        combined.add(*self.stats.values())
+        entries: dict[FunctionKey, Any] = combined.stats  # type: ignore
+        hottest = sorted(entries.items(), key=lambda item: item[1][2], reverse=True)
+        print(f"Hottest functions (self time across {len(self.stats)} stages):")
+        print(f"  {'self s':>8} {'cumulative s':>12} {'calls':>10}  function")
+        for function, (_, calls, total, cumulative, _) in hottest[: self.top]:
+            print(
+                f"  {total:>8.3f} {cumulative:>12.3f} {calls:>10}  {format_function(function)}"
+            )
+        stages = sorted(
+            self.stats.items(), key=lambda item: item[1].total_tt, reverse=True  # type: ignore
+        )
+        print("Slowest stages (profiled time):")
+        for stage, stats in stages[: self.top]:
+            peak = (
+                f"  peak {self.peaks[stage] / 1e6:.1f} MB" if stage in self.peaks else ""
+            )
+            print(f"  {stats.total_tt:>8.3f}s  {stage}{peak}")  # type: ignore
+        if self.allocations:
+            print("Largest allocation sites (net new memory per stage):")
+            for stage, diff in sorted(
+                self.allocations, key=lambda item: item[1].size_diff, reverse=True
+            )[: self.top]:
+                frame = diff.traceback[0]
+                print(
+                    f"  {diff.size_diff / 1e6:>8.2f} MB {diff.count_diff:>10} blocks  {Pathier(frame.filename).name}:{frame.lineno}  ({stage})"
+                )
+        print(f"Per stage profiles saved to {self.output_dir}")
@@ -0,0 +1,252 @@
+import argparse
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlparse
+
+from chibased import ChiBased, db_path, get_load_generation
+
+views = [
+    "num_inspected_businesses_by_ward",
+    "inspections_by_ward",
+    "inspection_results_by_ward",
+    "failed_inspections_by_ward",
+    "passed_inspections_by_ward",
+    "violation_type_occurrences",
+    "violation_type_occurrence_by_ward",
+    "total_violations_by_ward",
+    "inspection_type_occurrence_by_ward",
+    "canvass_inspections_by_ward",
+    "complaint_inspections_by_ward",
+    "pass_fail_ratio_by_ward",
+]
+""" Read-only HTTP/JSON service for the `sqlite_views.sql` ward aggregates with a result cache. """
+
+
+class ConnectionPool:
+    def __init__(self, size: int):
+        """A fixed size pool of read-only `ChiBased` connections with the `sqlite_views.sql` views created."""
+        self.size = size
+        self.connections: queue.Queue[ChiBased] = queue.Queue()
+        self.lock = threading.Lock()
+        self.generation = -1
+        self.refresh()
+
+    def refresh(self):
+        """Replace every pooled connection if `load_to_sqlite()` has run since the pool was filled.
+
+        `load_to_sqlite()` recreates `chi.db`, so old connections would still be reading the deleted file.
+
+        The new connections are opened before the old ones are closed,
+        so if opening them fails (e.g. `chi.db` is mid-rebuild) the `sqlite3.Error` is raised and the old pool is kept until the next call.
+
+        No `ChiBased` is constructed until the generation changes, and not at all if `chi.db` is missing,
+        since constructing one creates an empty `chi.db`.
+
+        Returns `True` if the pool was refreshed."""
+        generation = get_load_generation()
+        if generation == self.generation:
+            return False
+        with self.lock:
+            if generation == self.generation:
+                return False
+            if not db_path.exists():
+                raise sqlite3.OperationalError(f"`{db_path}` doesn't exist.")
+            connections: list[ChiBased] = []
+            try:
+                for _ in range(self.size):
+                    db = ChiBased(read_only=True)
+                    connections.append(db)
+                    db.create_views_script()
+            except sqlite3.Error:
+                for db in connections:
+                    db.close()
+                raise
+            for _ in range(self.size if self.generation != -1 else 0):
+                self.connections.get().close()
+            for db in connections:
+                self.connections.put(db)
+            self.generation = generation
+        return True
+
+    @contextmanager
+    def connection(self) -> Iterator[ChiBased]:
+        db = self.connections.get()
+        try:
+            yield db
+        finally:
+            self.connections.put(db)
+
+
+class ResultCache:
+    def __init__(self, max_size: int):
+        """Least recently used cache of query results."""
+        self.max_size = max_size
+        self.results: OrderedDict[tuple[Any, ...], list[dict[str, Any]]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[Any, ...]) -> list[dict[str, Any]] | None:
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return self.results[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple[Any, ...], result: list[dict[str, Any]]):
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class QueryService:
+    def __init__(self, pool_size: int = 4, cache_size: int = 256):
+        self.pool = ConnectionPool(pool_size)
+        self.cache = ResultCache(cache_size)
+        self.latencies: deque[float] = deque(maxlen=10_000)
+
+    def query_view(
+        self, view: str, ward: int | None = None, limit: int = 1000, offset: int = 0
+    ) -> list[dict[str, Any]]:
+        """Return rows from `view`, optionally filtered to `ward`."""
+        if view not in views:
+            raise KeyError(view)
+        if self.pool.refresh():
+            self.cache.clear()
+        key = (self.pool.generation, view, ward, limit, offset)
+        result = self.cache.get(key)
+        if result is None:
+            query = f"SELECT * FROM {view}"
+            parameters: list[Any] = []
+            if ward is not None and view != "violation_type_occurrences":
+                query += " WHERE ward = ?"
+                parameters.append(ward)
+            query += " LIMIT ? OFFSET ?;"
+            parameters.extend([limit, offset])
+            with self.pool.connection() as db:
+                result = db.query(query, parameters)
+            self.cache.put(key, result)
+        return result
+
+    def record_latency(self, start: float):
+        self.latencies.append((time.perf_counter() - start) * 1000)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Request latency percentiles in milliseconds and cache statistics."""
+        latencies = sorted(self.latencies)
+        percentile = lambda p: (
+            latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+            if latencies
+            else None
+        )
+        return {
+            "requests": len(latencies),
+            "p50_ms": percentile(0.5),
+            "p99_ms": percentile(0.99),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_hit_rate": self.cache.hit_rate,
+            "load_generation": self.pool.generation,
+        }
+
+
+def get_handler(service: QueryService) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        """Endpoints:
+        * `GET /views`: List available views.
+        * `GET /views/{view}?ward=&limit=&offset=`: Rows from `view`.
+        * `GET /stats`: Latency and cache statistics."""
+
+        def send_json(self, status: int, body: Any):
+            content = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if parts == ["stats"]:
+                self.send_json(200, service.stats)
+                return
+            if parts == ["views"]:
+                self.send_json(200, views)
+                return
+            if len(parts) != 2 or parts[0] != "views" or parts[1] not in views:
+                self.send_json(404, {"error": f"Unknown endpoint '{url.path}'."})
+                return
+            try:
+                rows = service.query_view(
+                    parts[1],
+                    int(params["ward"]) if "ward" in params else None,
+                    int(params.get("limit", 1000)),
+                    int(params.get("offset", 0)),
+                )
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            except sqlite3.Error as e:
+                # e.g. `chi.db` is missing or being rebuilt when the pool refreshes
+                self.send_json(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            self.send_json(200, rows)
+            service.record_latency(start)
+
+        def log_message(self, format: str, *args: Any):
+            pass
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, pool_size: int = 4, cache_size: int = 256):
+    service = QueryService(pool_size, cache_size)
+    server = ThreadingHTTPServer((host, port), get_handler(service))
+    print(f"Serving chi.db views at http://{host}:{port}/views")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(service.stats, indent=2))
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--pool-size", type=int, default=4, help="Number of read-only connections."
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=256, help="Number of cached query results."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    serve(args.host, args.port, args.pool_size, args.cache_size)
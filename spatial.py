@@ -0,0 +1,196 @@
+import math
+from collections import Counter
+from typing import Any
+
+import numpy
+from noiftimer import time_it
+
+from chibased import ChiBased
+
+earth_radius = 6_371_008.8  # meters
+meters_per_degree = 111_320  # of latitude
+spatial_tables = ["business_addresses", "facility_addresses"]
+""" R*Tree backed radius and nearest neighbour queries over address coordinates. """
+
+
+def haversine(
+    latitude: float,
+    longitude: float,
+    latitudes: numpy.ndarray,
+    longitudes: numpy.ndarray,
+) -> numpy.ndarray:
+    """Return the great circle distance in meters from (`latitude`, `longitude`) to each point in `latitudes` and `longitudes`."""
+    latitude_radians = numpy.radians(latitude)
+    latitudes_radians = numpy.radians(latitudes)
+    a = (
+        numpy.sin((latitudes_radians - latitude_radians) / 2) ** 2
+        + numpy.cos(latitude_radians)
+        * numpy.cos(latitudes_radians)
+        * numpy.sin(numpy.radians(longitudes - longitude) / 2) ** 2
+    )
+    return 2 * earth_radius * numpy.arcsin(numpy.sqrt(a))
+
+
+@time_it()
+def build_spatial_index(db: ChiBased, tables: list[str] = spatial_tables):
+    """Populate the `{table}_rtree` index for each table in `tables` from its `latitude` and `longitude` columns."""
+    for table in tables:
+        db.query(f"DELETE FROM {table}_rtree;")
+        db.query(
+            f"""INSERT INTO {table}_rtree
+            SELECT id, latitude, latitude, longitude, longitude FROM {table}
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL;"""
+        )
+
+
+def get_candidates(
+    db: ChiBased, table: str, latitude: float, longitude: float, radius: float
+) -> list[dict[str, Any]]:
+    """Return rows of `table` inside the bounding box of the circle of `radius` meters around (`latitude`, `longitude`)."""
+    latitude_delta = radius / meters_per_degree
+    longitude_delta = radius / (
+        meters_per_degree * max(math.cos(math.radians(latitude)), 1e-6)
+    )
+    return db.query(
+        f"""SELECT {table}.* FROM {table}_rtree
+        INNER JOIN {table} ON {table}_rtree.id = {table}.id
+        WHERE max_latitude >= ? AND min_latitude <= ? AND max_longitude >= ? AND min_longitude <= ?;""",
+        (
+            latitude - latitude_delta,
+            latitude + latitude_delta,
+            longitude - longitude_delta,
+            longitude + longitude_delta,
+        ),
+    )
+
+
+def refine(
+    rows: list[dict[str, Any]], latitude: float, longitude: float, radius: float
+) -> list[dict[str, Any]]:
+    """Add a `distance` field in meters to each row and return the rows within `radius` meters, nearest first."""
+    if not rows:
+        return []
+    distances = haversine(
+        latitude,
+        longitude,
+        numpy.array([row["latitude"] for row in rows], dtype=float),
+        numpy.array([row["longitude"] for row in rows], dtype=float),
+    )
+    refined = []
+    for i in numpy.argsort(distances, kind="stable"):
+        if distances[i] > radius:
+            break
+        rows[i]["distance"] = float(distances[i])
+        refined.append(rows[i])
+    return refined
+
+
+def within_radius(
+    db: ChiBased, table: str, latitude: float, longitude: float, radius: float
+) -> list[dict[str, Any]]:
+    """Return rows of `table` (`business_addresses` or `facility_addresses`) within `radius` meters of (`latitude`, `longitude`).
+
+    Rows are sorted nearest first and have an added `distance` field in meters.
+
+    >>> with ChiBased() as db:
+    >>>     facilities = within_radius(db, "facility_addresses", 41.8781, -87.6298, 500)"""
+    return refine(
+        get_candidates(db, table, latitude, longitude, radius),
+        latitude,
+        longitude,
+        radius,
+    )
+
+
+def nearest(
+    db: ChiBased,
+    table: str,
+    latitude: float,
+    longitude: float,
+    k: int = 1,
+    max_radius: float = 50_000,
+) -> list[dict[str, Any]]:
+    """Return the `k` rows of `table` nearest to (`latitude`, `longitude`) that are within `max_radius` meters.
+
+    The search radius starts small and doubles until `k` rows are found,
+    so dense areas only touch a handful of index entries."""
+    radius = min(250.0, max_radius)
+    while True:
+        rows = within_radius(db, table, latitude, longitude, radius)
+        if len(rows) >= k or radius >= max_radius:
+            return rows[:k]
+        radius = min(radius * 2, max_radius)
+
+
+def inspections_within_radius(
+    db: ChiBased,
+    latitude: float,
+    longitude: float,
+    radius: float,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> list[dict[str, Any]]:
+    """Return inspections at facilities within `radius` meters of (`latitude`, `longitude`).
+
+    `start_date` and `end_date` (`%Y-%m-%d`, inclusive) limit the inspection dates,
+    and the partitions read if `chi.db` is partitioned."""
+    facilities = within_radius(db, "facility_addresses", latitude, longitude, radius)
+    distances = {facility["id"]: facility["distance"] for facility in facilities}
+    query = f"""SELECT inspections.*, facility_addresses.street
+        FROM {db.partition_source("inspections", start_date, end_date)} AS inspections
+        INNER JOIN facility_addresses ON inspections.facility_address_id = facility_addresses.id
+        WHERE inspections.facility_address_id IN (SELECT value FROM json_each(?))"""
+    parameters: list[Any] = [f"[{','.join(str(id_) for id_ in distances)}]"]
+    if start_date:
+        query += " AND inspections.date >= ?"
+        parameters.append(start_date)
+    if end_date:
+        query += " AND inspections.date <= ?"
+        parameters.append(end_date)
+    inspections = db.query(query + ";", parameters)
+    for inspection in inspections:
+        inspection["distance"] = distances[inspection["facility_address_id"]]
+    return sorted(inspections, key=lambda inspection: inspection["distance"])
+
+
+@time_it()
+def backfill_facility_wards(db: ChiBased, k: int = 5, max_radius: float = 250) -> int:
+    """Set `facility_addresses.ward` for rows where it's missing.
+
+    A facility gets the ward of a business address with the same street if there is one,
+    otherwise the most common ward of its `k` nearest business addresses within `max_radius` meters.
+
+    Returns the number of updated facilities."""
+    street_wards = {
+        row["street"]: row["ward"]
+        for row in db.query(
+            "SELECT street, ward FROM business_addresses WHERE ward IS NOT NULL;"
+        )
+    }
+    updates = []
+    for facility in db.query(
+        "SELECT id, street, latitude, longitude FROM facility_addresses WHERE ward IS NULL;"
+    ):
+        ward = street_wards.get(facility["street"])
+        if ward is None and facility["latitude"] is not None:
+            wards = [
+                row["ward"]
+                for row in nearest(
+                    db,
+                    "business_addresses",
+                    facility["latitude"],
+                    facility["longitude"],
+                    k,
+                    max_radius,
+                )
+                if row["ward"] is not None
+            ]
+            if wards:
+                ward = Counter(wards).most_common(1)[0][0]
+        if ward is not None:
+            updates.append((ward, facility["id"]))
+    assert db.connection
+    db.connection.executemany(
+        "UPDATE facility_addresses SET ward = ? WHERE id = ?;", updates
+    )
+    return len(updates)
@@ -0,0 +1,219 @@
+-- SQLite equivalents of the views in `mysql_views.sql`.
+-- Created as TEMP views so they can be added to read-only connections
+-- (and resolve `inspections`/`violations` to the partition views when `chi.db` is partitioned).
+-- Ratios multiply by 1.0 since SQLite, unlike MySQL, truncates integer division.
+-- Number of inspected businesses by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    num_inspected_businesses_by_ward AS
+SELECT
+    COUNT(*) AS num_businesses,
+    business_addresses.ward
+FROM
+    inspected_businesses
+    INNER JOIN licenses ON inspected_businesses.license_number = licenses.license_number
+    INNER JOIN businesses ON licenses.account_number = businesses.account_number
+    INNER JOIN business_addresses ON businesses.address_id = business_addresses.id
+GROUP BY
+    business_addresses.ward;
+
+-- Inspections by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    inspections_by_ward AS
+SELECT
+    COUNT(*) AS inspection_count,
+    num_inspected_businesses_by_ward.num_businesses,
+    COUNT(*) * 1.0 / num_inspected_businesses_by_ward.num_businesses AS inspections_to_business_ratio,
+    business_addresses.ward
+FROM
+    inspections
+    INNER JOIN licenses ON inspections.license_number = licenses.license_number
+    INNER JOIN businesses ON licenses.account_number = businesses.account_number
+    INNER JOIN business_addresses ON businesses.address_id = business_addresses.id
+    INNER JOIN num_inspected_businesses_by_ward ON business_addresses.ward = num_inspected_businesses_by_ward.ward
+GROUP BY
+    business_addresses.ward
+ORDER BY
+    inspections_to_business_ratio DESC;
+
+-- Inspection results by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    inspection_results_by_ward AS
+SELECT
+    result_types.id,
+    result_types.description AS result,
+    COUNT(*) AS num_results,
+    num_inspected_businesses_by_ward.num_businesses,
+    COUNT(*) * 1.0 / num_inspected_businesses_by_ward.num_businesses AS results_to_business_ratio,
+    business_addresses.ward
+FROM
+    inspections
+    INNER JOIN licenses ON inspections.license_number = licenses.license_number
+    INNER JOIN businesses ON licenses.account_number = businesses.account_number
+    INNER JOIN business_addresses ON businesses.address_id = business_addresses.id
+    INNER JOIN result_types ON inspections.result_type_id = result_types.id
+    INNER JOIN num_inspected_businesses_by_ward ON business_addresses.ward = num_inspected_businesses_by_ward.ward
+GROUP BY
+    business_addresses.ward,
+    result_types.id
+ORDER BY
+    business_addresses.ward,
+    results_to_business_ratio DESC;
+
+-- Failed inspections by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    failed_inspections_by_ward AS
+SELECT
+    *
+FROM
+    inspection_results_by_ward
+WHERE
+    result = 'Fail'
+ORDER BY
+    results_to_business_ratio DESC;
+
+-- Passed inspections by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    passed_inspections_by_ward AS
+SELECT
+    'Pass' AS result,
+    SUM(num_results) AS total_results,
+    num_businesses,
+    SUM(num_results) * 1.0 / num_businesses AS results_to_business_ratio,
+    ward
+FROM
+    inspection_results_by_ward
+WHERE
+    result IN ('Pass', 'Pass W/ Conditions')
+GROUP BY
+    ward
+ORDER BY
+    results_to_business_ratio DESC;
+
+-- Violation type occurrences -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    violation_type_occurrences AS
+SELECT
+    violation_types.id,
+    violation_types.name AS violation,
+    COUNT(*) AS occurrences
+FROM
+    violations
+    INNER JOIN violation_types ON violations.violation_type_id = violation_types.id
+GROUP BY
+    violations.violation_type_id
+ORDER BY
+    occurrences DESC;
+
+-- Violation type occurrences by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    violation_type_occurrence_by_ward AS
+SELECT
+    violation_types.id,
+    violation_types.name AS violation,
+    COUNT(*) AS occurrences,
+    COUNT(*) * 1.0 / num_inspected_businesses_by_ward.num_businesses AS violations_to_business_ratio,
+    business_addresses.ward
+FROM
+    violations
+    INNER JOIN violation_types ON violations.violation_type_id = violation_types.id
+    INNER JOIN inspections ON violations.inspection_id = inspections.id
+    INNER JOIN licenses ON inspections.license_number = licenses.license_number
+    INNER JOIN businesses ON licenses.account_number = businesses.account_number
+    INNER JOIN business_addresses ON businesses.address_id = business_addresses.id
+    INNER JOIN num_inspected_businesses_by_ward ON business_addresses.ward = num_inspected_businesses_by_ward.ward
+GROUP BY
+    business_addresses.ward,
+    violations.violation_type_id
+ORDER BY
+    business_addresses.ward,
+    occurrences DESC;
+
+-- Total violations by ward ---------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    total_violations_by_ward AS
+SELECT
+    COUNT(*) as num_violations,
+    business_addresses.ward,
+    COUNT(*) * 1.0 / num_inspected_businesses_by_ward.num_businesses AS total_violations_to_business_ratio
+FROM
+    violations
+    INNER JOIN inspections ON violations.inspection_id = inspections.id
+    INNER JOIN licenses ON inspections.license_number = licenses.license_number
+    INNER JOIN businesses ON licenses.account_number = businesses.account_number
+    INNER JOIN business_addresses ON businesses.address_id = business_addresses.id
+    INNER JOIN num_inspected_businesses_by_ward ON business_addresses.ward = num_inspected_businesses_by_ward.ward
+GROUP BY
+    business_addresses.ward
+ORDER BY
+    total_violations_to_business_ratio DESC;
+
+-- Inspection types by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    inspection_type_occurrence_by_ward AS
+SELECT
+    inspection_types.id AS inspection_type_id,
+    COUNT(*) AS num_inspections,
+    inspection_types.name AS inspection_type,
+    num_inspected_businesses_by_ward.num_businesses,
+    COUNT(*) * 1.0 / num_inspected_businesses_by_ward.num_businesses AS inspection_type_to_business_ratio,
+    business_addresses.ward
+FROM
+    inspections
+    INNER JOIN inspection_types ON inspections.inspection_type_id = inspection_types.id
+    INNER JOIN licenses ON inspections.license_number = licenses.license_number
+    INNER JOIN businesses ON licenses.account_number = businesses.account_number
+    INNER JOIN business_addresses ON businesses.address_id = business_addresses.id
+    INNER JOIN num_inspected_businesses_by_ward ON business_addresses.ward = num_inspected_businesses_by_ward.ward
+GROUP BY
+    business_addresses.ward,
+    inspection_types.id
+ORDER BY
+    business_addresses.ward,
+    num_inspections DESC;
+
+-- Number of canvass inspections by ward -----------------------------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    canvass_inspections_by_ward AS
+SELECT
+    *
+FROM
+    inspection_type_occurrence_by_ward
+WHERE
+    inspection_type = 'Canvass'
+ORDER BY
+    inspection_type_to_business_ratio DESC;
+
+-- Number of inspections due to complaints by ward ----------------------------------------------------
+-- Complaint, Short Form Complaint, or Suspected Food Poisoning
+CREATE TEMP VIEW IF NOT EXISTS
+    complaint_inspections_by_ward AS
+SELECT
+    'Complaint|Suspected Food Poisoning' AS reason,
+    SUM(num_inspections) AS total_inspections,
+    num_businesses,
+    SUM(num_inspections) * 1.0 / num_businesses AS inspections_to_business_ratio,
+    ward
+FROM
+    inspection_type_occurrence_by_ward
+WHERE
+    inspection_type IN (
+        'Complaint',
+        'Short Form Complaint',
+        'Suspected Food Poisoning'
+    )
+GROUP BY
+    ward
+ORDER BY
+    inspections_to_business_ratio DESC;
+
+-- Ratio of Passed to Failed Inspections By Ward ----------------------------------------------------
+CREATE TEMP VIEW IF NOT EXISTS
+    pass_fail_ratio_by_ward AS
+SELECT
+    passed_inspections_by_ward.total_results * 1.0 / failed_inspections_by_ward.num_results AS pass_fail_ratio,
+    passed_inspections_by_ward.ward
+FROM
+    passed_inspections_by_ward
+    INNER JOIN failed_inspections_by_ward ON passed_inspections_by_ward.ward = failed_inspections_by_ward.ward
+ORDER BY
+    pass_fail_ratio DESC;
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import time
+from typing import Any, Callable
+
+from pathier import Pathier
+
+root = Pathier(__file__).parent
+cache_path = root / "stage_cache.json"
+""" Make-style caching for pipeline stages. """
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        inputs: list[str],
+        code: list[str],
+        outputs: list[str],
+    ):
+        """A unit of pipeline work that only needs to rerun when its fingerprint changes.
+
+        #### :params:
+        * `name`: The stage name used in the cache and by `--force`.
+        * `func`: The function that performs the stage.
+        * `inputs`: Data files (relative to the repo root) the stage reads.
+        * `code`: Source files (relative to the repo root) that implement the stage.
+        Their hashes serve as the stage's code version.
+        * `outputs`: Files (relative to the repo root) the stage produces.
+        A stage is rerun if any of these are missing or were modified since it last ran.
+        A stage without outputs, like the MySQL load, has nothing to check and is always rerun."""
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.code = code
+        self.outputs = outputs
+
+
+class StageCache:
+    def __init__(self, path: Pathier = cache_path):
+        """Persists stage fingerprints, output hashes, and run times to `path`.
+
+        File hashes are also memoized by size and modification time so large unchanged files,
+        like `chi.db`, aren't rehashed on every run."""
+        self.path = path
+        self.data: dict[str, dict[str, Any]] = (
+            json.loads(self.path.read_text()) if self.path.exists() else {}
+        )
+        self.data.setdefault("stages", {})
+        self.data.setdefault("files", {})
+        self.report: list[tuple[str, str, float]] = []
+
+    def save(self):
+        self.path.write_text(json.dumps(self.data, indent=2))
+
+    def hash_file(self, file: str) -> str | None:
+        """Return the sha256 hexdigest of `file` or `None` if it doesn't exist."""
+        path = root / file
+        if not path.exists():
+            return None
+        stat = path.stat()
+        cached = self.data["files"].get(file)
+        if (
+            cached
+            and cached["size"] == stat.st_size
+            and cached["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return cached["sha256"]
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        sha256 = digest.hexdigest()
+        self.data["files"][file] = {
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        return sha256
+
+    def fingerprint(self, stage: Stage) -> str:
+        """Hash of the stage's input and code file hashes."""
+        state = {
+            "inputs": {file: self.hash_file(file) for file in stage.inputs},
+            "code": {file: self.hash_file(file) for file in stage.code},
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+    def output_hashes(self, stage: Stage) -> dict[str, str | None]:
+        return {file: self.hash_file(file) for file in stage.outputs}
+
+    def is_fresh(self, stage: Stage) -> bool:
+        """Whether `stage` has a cached run matching its current fingerprint and unmodified outputs.
+
+        Stages without outputs are never fresh."""
+        if not stage.outputs:
+            return False
+        record = self.data["stages"].get(stage.name)
+        if not record or record["fingerprint"] != self.fingerprint(stage):
+            return False
+        outputs = self.output_hashes(stage)
+        return None not in outputs.values() and outputs == record["outputs"]
+
+    def run(self, stage: Stage, force: bool = False):
+        """Run `stage` unless it's fresh and `force` is `False`."""
+        if not force and self.is_fresh(stage):
+            self.report.append(
+                (stage.name, "skipped", self.data["stages"][stage.name]["elapsed"])
+            )
+            return
+        fingerprint = self.fingerprint(stage)
+        start = time.perf_counter()
+        stage.func()
+        elapsed = time.perf_counter() - start
+        self.data["stages"][stage.name] = {
+            "fingerprint": fingerprint,
+            "outputs": self.output_hashes(stage),
+            "elapsed": elapsed,
+        }
+        self.save()
+        self.report.append((stage.name, "ran", elapsed))
+
+    def print_report(self):
+        """Print which stages ran or were skipped and the time saved by skipping."""
+        print("Stage report:")
+        for name, status, elapsed in self.report:
+            print(f"  {name:<10} {status:<8} {elapsed:.2f}s")
+        saved = sum(elapsed for _, status, elapsed in self.report if status == "skipped")
+        print(f"Time saved by skipping stages: {saved:.2f}s")